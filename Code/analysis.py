@@ -0,0 +1,84 @@
+import multiprocessing
+import os
+from multiprocessing import shared_memory
+from bitboard import BitBoard
+from search import Search
+from transposition import TranspositionTable
+
+"""
+scoring every legal move of a position at once, using a process for each
+core. the search runs in a single interpreter, so threads would take turns
+on one core, but separate processes run side by side.
+
+the root moves are shared out among the worker processes, and each worker
+plays its moves on its own board (the game replayed from its start, so
+that repetitions are seen) and searches the position after each of them. the scores are written into a
+block of shared memory with one slot per root move, which the parent reads
+once all the moves are done.
+"""
+
+#the bytes for each score in the shared memory
+SCORE_BYTES = 8
+
+#the state of a worker process, set once when it starts
+_worker = {}
+
+"""
+set up a worker process, with its own board and transposition table
+start_fen/played - the position the game started from and the UCI moves played since
+"""
+def _start_worker(start_fen, played, moves, depth, megabytes, memory_name):
+    board = BitBoard.from_fen(start_fen)
+    for uci in played:
+        board.execute_move(board.all_legal_moves_dict(board.turn())[uci])
+    _worker["board"] = board
+    _worker["moves"] = moves
+    _worker["depth"] = depth
+    _worker["table"] = TranspositionTable(megabytes)
+    _worker["memory_name"] = memory_name
+
+"""
+score the root move with the given index, in a worker process
+"""
+def _score_move(index):
+    board = _worker["board"]
+    move = board.all_legal_moves_dict(board.turn())[_worker["moves"][index]]
+    board.execute_move(move)
+    #the score after the move is from the opponent's point of view
+    score = -Search(board, table=_worker["table"]).score(_worker["depth"] - 1, ply=1)
+    board.undo_move()
+    #the memory is only attached while writing, so the worker never leaves it open
+    memory = shared_memory.SharedMemory(name=_worker["memory_name"])
+    scores = memory.buf.cast("q")
+    scores[index] = score
+    scores.release()
+    memory.close()
+
+"""
+score every legal move of the side to move, searching each to the given
+depth (including the move itself) with the moves split between processes.
+returns a dictionary from the UCI representation of each move to its score
+in centipawns from the point of view of the side making it
+processes - the number of worker processes, one per core if not given
+megabytes - the memory for each worker's transposition table
+"""
+def analyse(board, depth, processes=None, megabytes=16):
+    moves = sorted(board.all_legal_moves_dict(board.turn()))
+    if len(moves) == 0:
+        return {}
+    if processes == None:
+        processes = os.cpu_count() or 1
+    processes = min(processes, len(moves))
+    memory = shared_memory.SharedMemory(create=True, size=SCORE_BYTES * len(moves))
+    try:
+        with multiprocessing.Pool(processes, _start_worker,
+                (board.start_fen(), board.uci_moves(), moves, depth, megabytes, memory.name)) as pool:
+            #one move at a time, so a worker that finishes early takes the next move
+            pool.map(_score_move, range(len(moves)), chunksize=1)
+        scores = memory.buf.cast("q")
+        results = {moves[i]: scores[i] for i in range(len(moves))}
+        scores.release()
+    finally:
+        memory.close()
+        memory.unlink()
+    return results
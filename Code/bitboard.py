@@ -0,0 +1,523 @@
+from chessboard import Board
+from constants import *
+from move import Move
+
+"""
+bitboard representation of the board. every square is a single bit of a
+64 bit integer, with square = row * 8 + col, so a1 is bit 0, h1 is bit 7
+and h8 is bit 63
+"""
+
+NUM_SQUARES = NUM_ROWS * NUM_COLS
+ALL_SQUARES = (1 << NUM_SQUARES) - 1
+
+#the (row, col) of every square index, saves a divmod for every move created
+SQUARE_POS = [divmod(square, NUM_COLS) for square in range(NUM_SQUARES)]
+
+"""
+convert a (row, col) pair into a square index
+"""
+def square_index(row, col):
+    return row * NUM_COLS + col
+
+"""
+returns the index of the lowest set bit of a non-zero bitboard
+"""
+def lsb(bb):
+    return (bb & -bb).bit_length() - 1
+
+"""
+build a table of the squares reachable with a single jump from every square
+offsets - a list of (dr, dc) jumps
+"""
+def _jump_table(offsets):
+    table = []
+    for row in range(NUM_ROWS):
+        for col in range(NUM_COLS):
+            bb = 0
+            for dr, dc in offsets:
+                if 0 <= row + dr < NUM_ROWS and 0 <= col + dc < NUM_COLS:
+                    bb |= 1 << square_index(row + dr, col + dc)
+            table += [bb]
+    return table
+
+"""
+build a table of all the squares along a direction from every square,
+not including the square itself
+"""
+def _ray_table(dr, dc):
+    table = []
+    for row in range(NUM_ROWS):
+        for col in range(NUM_COLS):
+            bb = 0
+            r, c = row + dr, col + dc
+            while 0 <= r < NUM_ROWS and 0 <= c < NUM_COLS:
+                bb |= 1 << square_index(r, c)
+                r += dr
+                c += dc
+            table += [bb]
+    return table
+
+KNIGHT_ATTACKS = _jump_table([(2,1), (2,-1), (-2,1), (-2,-1), (1,2), (1,-2), (-1,2), (-1,-2)])
+KING_ATTACKS = _jump_table([(1,1), (1,0), (1,-1), (0,1), (0,-1), (-1,1), (-1,0), (-1,-1)])
+#the squares a pawn of each colour attacks from each square
+PAWN_ATTACKS = [_jump_table([(1,1), (1,-1)]), _jump_table([(-1,1), (-1,-1)])]
+
+#rays are split by whether they move towards higher or lower square indices,
+#as this decides whether the nearest blocker is the lowest or highest bit
+POSITIVE_STRAIGHT_RAYS = [_ray_table(1, 0), _ray_table(0, 1)]
+NEGATIVE_STRAIGHT_RAYS = [_ray_table(-1, 0), _ray_table(0, -1)]
+POSITIVE_DIAGONAL_RAYS = [_ray_table(1, 1), _ray_table(1, -1)]
+NEGATIVE_DIAGONAL_RAYS = [_ray_table(-1, 1), _ray_table(-1, -1)]
+#every ray as (table, whether it is positive, whether it is straight)
+RAYS = [(rays, True, True) for rays in POSITIVE_STRAIGHT_RAYS] + \
+        [(rays, False, True) for rays in NEGATIVE_STRAIGHT_RAYS] + \
+        [(rays, True, False) for rays in POSITIVE_DIAGONAL_RAYS] + \
+        [(rays, False, False) for rays in NEGATIVE_DIAGONAL_RAYS]
+
+#rows used for pawn double moves and promotions
+RANK_MASKS = [0xFF << (NUM_COLS * row) for row in range(NUM_ROWS)]
+PAWN_START_ROW = [1, NUM_ROWS - 2]
+PROMOTION_ROW = [NUM_ROWS - 1, 0]
+PAWN_STEP = [NUM_COLS, -NUM_COLS]
+#the squares the king passes through and lands on when castling
+CASTLE_PASSING = [0x6C, 0x6C << (NUM_COLS * (NUM_ROWS - 1))]
+
+"""
+the squares attacked along a set of rays from a square, stopping at
+(and including) the first occupied square along each ray
+"""
+def _slider_attacks(square, occupied, positive_rays, negative_rays):
+    attacks = 0
+    for rays in positive_rays:
+        ray = rays[square]
+        blockers = ray & occupied
+        if blockers:
+            ray ^= rays[(blockers & -blockers).bit_length() - 1]
+        attacks |= ray
+    for rays in negative_rays:
+        ray = rays[square]
+        blockers = ray & occupied
+        if blockers:
+            ray ^= rays[blockers.bit_length() - 1]
+        attacks |= ray
+    return attacks
+
+"""
+squares attacked by a rook on the given square with the given occupancy
+"""
+def rook_attacks(square, occupied):
+    return _slider_attacks(square, occupied, POSITIVE_STRAIGHT_RAYS, NEGATIVE_STRAIGHT_RAYS)
+
+"""
+squares attacked by a bishop on the given square with the given occupancy
+"""
+def bishop_attacks(square, occupied):
+    return _slider_attacks(square, occupied, POSITIVE_DIAGONAL_RAYS, NEGATIVE_DIAGONAL_RAYS)
+
+
+"""
+a board that keeps a bitboard for every piece type of every colour alongside
+the pieces, and uses them for move generation and attack queries.
+the pieces and moves are the same objects as on the regular board, so it can
+be used anywhere a Board is used
+"""
+class BitBoard(Board):
+
+    """
+    position the pieces on the board, then build the bitboards from them
+    """
+    def _load_board(self):
+        super()._load_board()
+        self._load_bitboards()
+
+    """
+    build the bitboards from the current positions of the pieces
+    """
+    def _load_bitboards(self):
+        #one bitboard per piece letter for each colour
+        self._bitboards = [dict.fromkeys("pnbrqk", 0) for colour in range(NUM_COLOURS)]
+        self._occupied = [0, 0]
+        for colour in range(NUM_COLOURS):
+            for piece in self._pieces[colour]:
+                if piece.is_alive():
+                    bit = 1 << square_index(piece.get_row(), piece.get_col())
+                    self._bitboards[colour][piece.get_letter()] |= bit
+                    self._occupied[colour] |= bit
+
+    """
+    execute a move, updating the bitboards and then the pieces
+    """
+    def execute_move(self, move):
+        colour = move.piece.get_colour()
+        bitboards = self._bitboards[colour]
+        start_bit = 1 << (move.start_row * NUM_COLS + move.start_col)
+        end_bit = 1 << (move.end_row * NUM_COLS + move.end_col)
+        letter = move.piece.get_letter()
+        bitboards[letter] ^= start_bit
+        if move.promotion != None:
+            bitboards[move.promotion] ^= end_bit
+        else:
+            bitboards[letter] ^= end_bit
+        self._occupied[colour] ^= start_bit | end_bit
+        #remove the killed piece, which is not always on the end square (en passant)
+        if move.kill != None:
+            kill_bit = 1 << (move.kill.get_row() * NUM_COLS + move.kill.get_col())
+            self._bitboards[1 - colour][move.kill.get_letter()] ^= kill_bit
+            self._occupied[1 - colour] ^= kill_bit
+        if move.castle != NO_CASTLE:
+            self._toggle_castle_rook(move)
+        super().execute_move(move)
+
+    """
+    undoes a move, updating the bitboards and then the pieces
+    """
+    def undo_move(self):
+        move = self.last_move()
+        colour = move.piece.get_colour()
+        bitboards = self._bitboards[colour]
+        start_bit = 1 << (move.start_row * NUM_COLS + move.start_col)
+        end_bit = 1 << (move.end_row * NUM_COLS + move.end_col)
+        #the piece still holds its promoted letter at this point
+        if move.promotion != None:
+            bitboards[move.promotion] ^= end_bit
+            bitboards["p"] ^= start_bit
+        else:
+            letter = move.piece.get_letter()
+            bitboards[letter] ^= start_bit | end_bit
+        self._occupied[colour] ^= start_bit | end_bit
+        if move.kill != None:
+            kill_bit = 1 << (move.kill.get_row() * NUM_COLS + move.kill.get_col())
+            self._bitboards[1 - colour][move.kill.get_letter()] ^= kill_bit
+            self._occupied[1 - colour] ^= kill_bit
+        if move.castle != NO_CASTLE:
+            self._toggle_castle_rook(move)
+        super().undo_move()
+
+    """
+    flip the bits of the rook that moves with a castle, works for both
+    executing and undoing the castle
+    """
+    def _toggle_castle_rook(self, move):
+        colour = move.piece.get_colour()
+        if move.castle == ROOKK_ID:
+            rook_bits = (1 << square_index(move.start_row, 7)) | (1 << square_index(move.start_row, 5))
+        else:
+            rook_bits = (1 << square_index(move.start_row, 0)) | (1 << square_index(move.start_row, 3))
+        self._bitboards[colour]["r"] ^= rook_bits
+        self._occupied[colour] ^= rook_bits
+
+    """
+    determines whether any piece of the given colour attacks the square,
+    with an optional replacement occupancy and set of squares to ignore
+    attackers on (used to test a move without executing it)
+    """
+    def _square_attacked(self, square, colour, occupied=None, removed=0):
+        if occupied == None:
+            occupied = self._occupied[WHITE] | self._occupied[BLACK]
+        attackers = self._bitboards[colour]
+        if KNIGHT_ATTACKS[square] & attackers["n"] & ~removed:
+            return True
+        if PAWN_ATTACKS[1 - colour][square] & attackers["p"] & ~removed:
+            return True
+        if KING_ATTACKS[square] & attackers["k"]:
+            return True
+        queens = attackers["q"]
+        rooks = (attackers["r"] | queens) & ~removed
+        if rooks and rook_attacks(square, occupied) & rooks:
+            return True
+        bishops = (attackers["b"] | queens) & ~removed
+        if bishops and bishop_attacks(square, occupied) & bishops:
+            return True
+        return False
+
+    """
+    the square of the king of the given colour
+    """
+    def _king_square(self, colour):
+        return lsb(self._bitboards[colour]["k"])
+
+    """
+    the squares with a piece on them as a bitmask, bit row * 8 + col, read
+    straight from the bitboards
+    """
+    def occupancy(self):
+        return self._occupied[WHITE] | self._occupied[BLACK]
+
+    """
+    determines whether any piece of the given colour attacks the square at
+    the given position
+    """
+    def is_square_attacked(self, row, col, colour):
+        return self._square_attacked(row * NUM_COLS + col, colour)
+
+    """
+    determines if a given move is LEGAL, tested against the bitboards with the
+    move applied to the occupancy rather than executing it
+    """
+    def is_move_legal(self, move):
+        colour = move.piece.get_colour()
+        if move.castle != NO_CASTLE:
+            return self._castle_legal(move)
+        start_bit = 1 << (move.start_row * NUM_COLS + move.start_col)
+        end_square = move.end_row * NUM_COLS + move.end_col
+        occupied = (self._occupied[WHITE] | self._occupied[BLACK]) ^ start_bit
+        occupied |= 1 << end_square
+        removed = 0
+        if move.kill != None:
+            removed = 1 << (move.kill.get_row() * NUM_COLS + move.kill.get_col())
+            #en passant kills a piece off the end square, so it also leaves its square
+            occupied &= ~removed
+            occupied |= 1 << end_square
+        if move.piece.get_letter() == "k":
+            king = end_square
+        else:
+            king = self._king_square(colour)
+        return not self._square_attacked(king, 1 - colour, occupied, removed)
+
+    """
+    a castle is legal when the king is not in check and does not move through
+    or into an attacked square
+    """
+    def _castle_legal(self, move):
+        return self.castle_checks(move) and \
+                not self._square_attacked(square_index(move.end_row, move.end_col), 1 - move.piece.get_colour())
+
+    """
+    returns the LEGAL moves out of a list of possible moves for a colour
+    """
+    def filter_legal_moves(self, colour, moves):
+        legal_moves = []
+        for move in moves:
+            if self.is_move_legal(move):
+                legal_moves += [move]
+        return legal_moves
+
+    """
+    returns all possible moves that can be made by a colour, generated from
+    the bitboards
+    """
+    def all_possible_moves(self, colour):
+        return self._generate_moves(colour, False)
+
+    """
+    returns all LEGAL moves a player can make. the checks and pins on the king
+    are found once as bitboards, and the target squares of every piece are
+    masked by them, so illegal moves are never created
+    """
+    def all_legal_moves(self, colour):
+        return self._generate_moves(colour, True)
+
+    """
+    returns the LEGAL captures and promotions of a colour, only generating
+    the moves onto enemy pieces and the last row
+    """
+    def legal_captures(self, colour):
+        return self._generate_moves(colour, True, quiets=False)
+
+    """
+    returns the LEGAL moves of a colour which are not captures or promotions
+    """
+    def legal_quiet_moves(self, colour):
+        return self._generate_moves(colour, True, captures=False)
+
+    """
+    finds the checks on the king of the given colour, and the pieces of that
+    colour that are pinned to the king.
+    returns a mask of the squares that capture or block the check (every square
+    if not in check, no squares if in double check) and a dictionary from the
+    square of each pinned piece to a mask of the squares along its pin
+    """
+    def _check_and_pin_masks(self, colour, king, occupied):
+        enemy = self._bitboards[1 - colour]
+        own = self._occupied[colour]
+        checkers = (KNIGHT_ATTACKS[king] & enemy["n"]) | (PAWN_ATTACKS[colour][king] & enemy["p"])
+        check_mask = checkers
+        num_checks = 1 if checkers else 0
+        pins = {}
+        straights = enemy["r"] | enemy["q"]
+        diagonals = enemy["b"] | enemy["q"]
+        for rays, positive, straight in RAYS:
+            sliders = straights if straight else diagonals
+            ray = rays[king]
+            if not ray & sliders:
+                continue
+            blockers = ray & occupied
+            first = lsb(blockers) if positive else blockers.bit_length() - 1
+            if (sliders >> first) & 1:
+                num_checks += 1
+                check_mask |= ray ^ rays[first]
+            elif (own >> first) & 1:
+                #one of our pieces, it is pinned if an enemy slider is next along
+                beyond = rays[first] & occupied
+                if beyond:
+                    second = lsb(beyond) if positive else beyond.bit_length() - 1
+                    if (sliders >> second) & 1:
+                        pins[first] = ray ^ rays[second]
+        if num_checks == 0:
+            check_mask = ALL_SQUARES
+        elif num_checks > 1:
+            check_mask = 0
+        return check_mask, pins
+
+    """
+    generate the moves for a colour from the bitboards
+    legal - True to only generate legal moves, False for all possible moves
+    captures - whether to generate the captures and promotions
+    quiets - whether to generate the other moves
+    """
+    def _generate_moves(self, colour, legal, captures=True, quiets=True):
+        moves = []
+        bitboards = self._bitboards[colour]
+        own = self._occupied[colour]
+        enemy = self._occupied[1 - colour]
+        occupied = own | enemy
+        #the squares the moves may end on, before any pawn rules
+        kinds = (enemy if captures else 0) | (ALL_SQUARES & ~occupied if quiets else 0)
+        king = lsb(bitboards["k"])
+        king_targets = KING_ATTACKS[king] & ~own
+        if legal:
+            check_mask, pins = self._check_and_pin_masks(colour, king, occupied)
+            #the king cannot hide from a slider by stepping back along its line
+            without_king = occupied ^ (1 << king)
+            safe = 0
+            targets = king_targets | CASTLE_PASSING[colour]
+            while targets:
+                low = targets & -targets
+                targets ^= low
+                if not self._square_attacked(low.bit_length() - 1, 1 - colour, without_king):
+                    safe |= low
+        else:
+            check_mask, pins, safe = ALL_SQUARES, {}, ALL_SQUARES
+        #the leaper and slider pieces, all of which move to the squares they attack
+        if check_mask:
+            for letter in "nbrq":
+                bb = bitboards[letter]
+                while bb:
+                    low = bb & -bb
+                    bb ^= low
+                    start = low.bit_length() - 1
+                    if letter == "n":
+                        targets = KNIGHT_ATTACKS[start]
+                    elif letter == "b":
+                        targets = bishop_attacks(start, occupied)
+                    elif letter == "r":
+                        targets = rook_attacks(start, occupied)
+                    else:
+                        targets = rook_attacks(start, occupied) | bishop_attacks(start, occupied)
+                    targets &= kinds & check_mask
+                    if start in pins:
+                        targets &= pins[start]
+                    moves += self._moves_to_targets(start, targets)
+            moves += self._pawn_moves(colour, occupied, enemy, check_mask, pins, legal, captures, quiets)
+        moves += self._moves_to_targets(king, king_targets & safe & kinds)
+        if check_mask == ALL_SQUARES and quiets:
+            moves += self._castle_moves(colour, occupied, safe)
+        return moves
+
+    """
+    create the moves for the piece at the start square to every target square
+    """
+    def _moves_to_targets(self, start, targets):
+        board = self._board
+        start_row, start_col = SQUARE_POS[start]
+        piece = board[start_row][start_col]
+        moves = []
+        while targets:
+            low = targets & -targets
+            targets ^= low
+            end_row, end_col = SQUARE_POS[low.bit_length() - 1]
+            moves += [Move(piece, start_row, start_col, end_row, end_col, kill=board[end_row][end_col])]
+        return moves
+
+    """
+    create the moves for a pawn, splitting it into the four promotions if
+    it reaches the last row
+    """
+    def _add_pawn_move(self, moves, colour, start, end, kill=None, en_passant=False):
+        start_row, start_col = SQUARE_POS[start]
+        end_row, end_col = SQUARE_POS[end]
+        piece = self._board[start_row][start_col]
+        if end_row == PROMOTION_ROW[colour]:
+            for option in ["r", "n", "q", "b"]:
+                moves += [Move(piece, start_row, start_col, end_row, end_col,
+                        kill=kill, promotion=option)]
+        else:
+            moves += [Move(piece, start_row, start_col, end_row, end_col,
+                    kill=kill, en_passant=en_passant)]
+
+    """
+    all pawn moves for a colour, including double moves, captures and en passant,
+    restricted to the squares allowed by the check mask and pins.
+    a step onto the last row is a promotion, so counts with the captures
+    """
+    def _pawn_moves(self, colour, occupied, enemy, check_mask, pins, legal, captures=True, quiets=True):
+        moves = []
+        board = self._board
+        step = PAWN_STEP[colour]
+        start_rank = RANK_MASKS[PAWN_START_ROW[colour]]
+        attacks = PAWN_ATTACKS[colour]
+        #the square a pawn can capture onto en passant, if any
+        passant = 0
+        passant_col = self.en_passant_col()
+        if passant_col != NO_PASSANT:
+            #the pawn that double stepped, and the square it passed over
+            victim_row = 4 if colour == WHITE else 3
+            victim = board[victim_row][passant_col]
+            passant = 1 << (square_index(victim_row, passant_col) + PAWN_STEP[colour])
+        bb = self._bitboards[colour]["p"]
+        while bb:
+            low = bb & -bb
+            bb ^= low
+            start = low.bit_length() - 1
+            allowed = check_mask & pins[start] if start in pins else check_mask
+            forward = start + step
+            if not (occupied >> forward) & 1:
+                promotes = SQUARE_POS[forward][0] == PROMOTION_ROW[colour]
+                if (allowed >> forward) & 1 and (captures if promotes else quiets):
+                    self._add_pawn_move(moves, colour, start, forward)
+                double = forward + step
+                if quiets and low & start_rank and not (occupied >> double) & 1 and (allowed >> double) & 1:
+                    self._add_pawn_move(moves, colour, start, double)
+            if not captures:
+                continue
+            targets = attacks[start] & enemy & allowed
+            while targets:
+                target = targets & -targets
+                targets ^= target
+                end = target.bit_length() - 1
+                end_row, end_col = SQUARE_POS[end]
+                self._add_pawn_move(moves, colour, start, end, kill=board[end_row][end_col])
+            if attacks[start] & passant:
+                #en passant removes two pieces from a row, so is tested on its own
+                start_row, start_col = SQUARE_POS[start]
+                end_row, end_col = SQUARE_POS[lsb(passant)]
+                move = Move(board[start_row][start_col], start_row, start_col, end_row, end_col,
+                        kill=victim, en_passant=True)
+                if not legal or self.is_move_legal(move):
+                    moves += [move]
+        return moves
+
+    """
+    the castling moves available to a colour. the colour must still have the
+    right to castle and the squares between the king and rook must be empty.
+    the king must also pass through and land on safe squares, which is every
+    square when generating all possible moves
+    """
+    def _castle_moves(self, colour, occupied, safe):
+        king = self._pieces[colour][KING_ID]
+        moves = []
+        row = king.get_row()
+        for rookID, between, passing in [(ROOKK_ID, [5, 6], [5, 6]), (ROOKQ_ID, [1, 2, 3], [3, 2])]:
+            if not self.can_castle(colour, rookID):
+                continue
+            allowed = True
+            for col in between:
+                if (occupied >> square_index(row, col)) & 1:
+                    allowed = False
+            for col in passing:
+                if not (safe >> square_index(row, col)) & 1:
+                    allowed = False
+            if allowed:
+                moves += [Move(king, row, king.get_col(), row, passing[-1], castle=rookID)]
+        return moves
@@ -1,6 +1,35 @@
 from piece import *
 from constants import *
 from move import Move, pos_to_square
+from zobrist import PIECE_KEYS, BLACK_TO_MOVE_KEY, CASTLING_KEYS, EN_PASSANT_KEYS
+from evaluation import MIDGAME_TABLES, ENDGAME_TABLES, PHASE_WEIGHTS, tapered
+
+"""
+the bit of the castling rights for a colour castling with the given rook
+"""
+def castling_bit(colour, rookID):
+    return 1 << (2 * colour + (0 if rookID == ROOKK_ID else 1))
+
+#castling rights with every castle still available
+ALL_CASTLING = 0b1111
+
+#the rank of each piece for ordering captures, only the order matters
+CAPTURE_RANKS = {"p": 1, "n": 2, "b": 3, "r": 4, "q": 5, "k": 6}
+
+#piece values for resolving exchanges, the king is worth more than anything
+#that could be won with it
+EXCHANGE_VALUES = {"p": 100, "n": 300, "b": 300, "r": 500, "q": 900, "k": 20000}
+
+"""
+the ordering key of a capture or promotion, higher is searched first.
+the most valuable victim comes first, then the least valuable attacker,
+and a promotion counts as taking the piece it becomes
+"""
+def capture_order(move):
+    gain = 0 if move.kill == None else CAPTURE_RANKS[move.kill.get_letter()]
+    if move.promotion != None:
+        gain += CAPTURE_RANKS[move.promotion] - CAPTURE_RANKS["p"]
+    return gain * 8 - CAPTURE_RANKS[move.piece.get_letter()]
 
 """
 decides the row based on the colour, inverts black
@@ -18,15 +47,58 @@ a chess game
 """
 class Board:
 
-    def __init__(self):
+    """
+    constructor.
+    fen - a position in FEN (Forsyth-Edwards notation) to start from,
+          the starting position of a game if not given
+    """
+    def __init__(self, fen=None):
         #create an array of arrays for the pieces with no pieces
         self._board = []
         for row in range(NUM_ROWS):
             self._board += [[None] * NUM_COLS]
         #then load in all the pieces
-        self._load_pieces()
-        self._load_board()
+        if fen == None:
+            self._load_pieces()
+            self._load_board()
+            self._reset_state(WHITE, ALL_CASTLING, NO_PASSANT)
+        else:
+            self._load_fen(fen)
+
+    """
+    set up the state of the position before the first move, which is only
+    different from a normal game start when loaded from a FEN
+    turn - the colour to move first
+    castling - the castling rights, a bitmask of castling_bit values
+    en_passant_col - the column a pawn just double stepped in, or NO_PASSANT
+    halfmove_clock - the number of half moves since a capture or pawn move
+    fullmove - the number of the full move being played
+    """
+    def _reset_state(self, turn, castling, en_passant_col, halfmove_clock=0, fullmove=1):
         self._moves = [] #track all the moves that have taken place
+        self._start_turn = turn
+        self._start_fullmove = fullmove
+        self._castling = castling
+        self._en_passant_col = en_passant_col
+        self._halfmove_clock = halfmove_clock
+        #the Zobrist hash of the position
+        self._hash = self._compute_hash()
+        #the material and piece square scores in white's favour, and the game phase
+        self._midgame, self._endgame, self._phase = self._compute_evaluation()
+        #the castling rights, en passant column, halfmove clock, hash and
+        #scores from before each move, restored when it is undone
+        self._state_history = []
+        #the number of times each position has been reached, for repetition
+        self._hash_counts = {self._hash: 1}
+        #the position before the first move, for replaying the game elsewhere
+        self._start_fen = self.fen()
+
+    """
+    create a board with the position given in FEN (Forsyth-Edwards notation)
+    """
+    @classmethod
+    def from_fen(cls, fen):
+        return cls(fen)
 
     """
     populate the board with the starting pieces
@@ -47,9 +119,142 @@ class Board:
             self._pieces[colour] += [Piece(colour, "b", BISHOPQ_ID, base_row, 2)]
             self._pieces[colour] += [Piece(colour, "q", QUEEN_ID, base_row, 3)]
             self._pieces[colour] += [Piece(colour, "k", KING_ID, base_row, 4)]
-            self._pieces[colour] += [Piece(colour, "b", BISHOPQ_ID, base_row, 5)]
-            self._pieces[colour] += [Piece(colour, "n", KNIGHTQ_ID, base_row, 6)]
-            self._pieces[colour] += [Piece(colour, "r", ROOKQ_ID, base_row, 7)]
+            self._pieces[colour] += [Piece(colour, "b", BISHOPK_ID, base_row, 5)]
+            self._pieces[colour] += [Piece(colour, "n", KNIGHTK_ID, base_row, 6)]
+            self._pieces[colour] += [Piece(colour, "r", ROOKK_ID, base_row, 7)]
+
+    """
+    populate the board with the pieces from a FEN position, along with the
+    side to move, castling rights, en passant column and move clocks.
+    each piece goes into the index it has at the start of the game where it can,
+    the rooks that can still castle go into the rook indices and pieces of
+    any index that is unfilled are dead.
+    raises a ValueError if the FEN is not a valid position
+    """
+    def _load_fen(self, fen):
+        fields = fen.split()
+        if len(fields) not in [4, 6]:
+            raise ValueError("FEN must have 4 or 6 fields: %s" % fen)
+        placement, turn, castling, passant = fields[:4]
+        #the clocks are optional, as they are often left off of positions
+        halfmove_clock, fullmove = fields[4:] if len(fields) == 6 else ["0", "1"]
+        if turn not in ["w", "b"]:
+            raise ValueError("FEN side to move must be w or b: %s" % fen)
+        if castling != "-" and (castling == "" or any([char not in "KQkq" for char in castling])):
+            raise ValueError("FEN castling must be - or from KQkq: %s" % fen)
+        if passant != "-" and (len(passant) != 2 or passant[0] not in "abcdefgh" or
+                passant[1] != ("6" if turn == "w" else "3")):
+            raise ValueError("FEN en passant square is not valid: %s" % fen)
+        if not halfmove_clock.isdigit() or not fullmove.isdigit() or int(fullmove) < 1:
+            raise ValueError("FEN move clocks must be numbers: %s" % fen)
+        #find all the pieces on the board for each colour
+        found = [[], []]
+        rows = placement.split("/")
+        if len(rows) != NUM_ROWS:
+            raise ValueError("FEN must have %d rows: %s" % (NUM_ROWS, fen))
+        for i in range(NUM_ROWS):
+            row = NUM_ROWS - 1 - i
+            col = 0
+            for char in rows[i]:
+                if char.isdigit():
+                    col += int(char)
+                elif char.lower() in "pnbrqk":
+                    if char.lower() == "p" and row in [0, NUM_ROWS - 1]:
+                        raise ValueError("FEN has a pawn on the first or last row: %s" % fen)
+                    found[WHITE if char.isupper() else BLACK] += [(char.lower(), row, col)]
+                    col += 1
+                else:
+                    raise ValueError("FEN has an unknown piece %s: %s" % (char, fen))
+            if col != NUM_COLS:
+                raise ValueError("FEN row %d does not have %d squares: %s" % (row + 1, NUM_COLS, fen))
+        for colour in range(NUM_COLOURS):
+            if len(found[colour]) > NUM_PIECES:
+                raise ValueError("FEN has more than %d pieces of a colour: %s" % (NUM_PIECES, fen))
+            if [letter for letter, row, col in found[colour]].count("k") != 1:
+                raise ValueError("FEN must have one king of each colour: %s" % fen)
+        #the en passant square must be just behind a pawn of the other colour
+        #that could have double stepped over it
+        if passant != "-":
+            passant_row = int(passant[1]) - 1
+            passant_col = ord(passant[0]) - ord("a")
+            mover = WHITE if turn == "w" else BLACK
+            step = 1 if mover == WHITE else -1
+            squares = {(row, col): (colour, letter) for colour in range(NUM_COLOURS)
+                    for letter, row, col in found[colour]}
+            if squares.get((passant_row - step, passant_col)) != (1 - mover, "p") or \
+                    (passant_row, passant_col) in squares or (passant_row + step, passant_col) in squares:
+                raise ValueError("FEN en passant square is not behind a pawn that double stepped: %s" % fen)
+        #then assign all of the pieces their indices
+        self._pieces = [[None] * NUM_PIECES, [None] * NUM_PIECES]
+        for colour in range(NUM_COLOURS):
+            self._load_fen_pieces(colour, found[colour], castling)
+        self._load_board()
+        #the castling rights that the pieces are in place for
+        rights = 0
+        for colour, letters in [(WHITE, "KQ"), (BLACK, "kq")]:
+            for rookID, letter in zip([ROOKK_ID, ROOKQ_ID], letters):
+                rook = self._pieces[colour][rookID]
+                if letter in castling and rook.is_alive() and not rook.has_moved() and \
+                        not self._pieces[colour][KING_ID].has_moved():
+                    rights |= castling_bit(colour, rookID)
+        passant_col = NO_PASSANT if passant == "-" else ord(passant[0]) - ord("a")
+        self._reset_state(WHITE if turn == "w" else BLACK, rights, passant_col,
+                int(halfmove_clock), int(fullmove))
+        #the side that has just moved cannot have left its king in check
+        if self.is_check(self.turn()):
+            raise ValueError("FEN has the side not to move in check: %s" % fen)
+
+    """
+    create the pieces of one colour from a FEN position
+    found - a list of (letter, row, col) for each piece of the colour
+    castling - the castling field of the FEN
+    """
+    def _load_fen_pieces(self, colour, found, castling):
+        pieces = self._pieces[colour]
+        base_row = row_conv(colour, 0)
+        kingside, queenside = ("K", "Q") if colour == WHITE else ("k", "q")
+        #the index each type of piece has at the start of the game
+        slots = {"p": list(range(NUM_COLS)), "r": [ROOKQ_ID, ROOKK_ID], "n": [KNIGHTQ_ID, KNIGHTK_ID],
+                "b": [BISHOPQ_ID, BISHOPK_ID], "q": [QUEEN_ID], "k": [KING_ID]}
+        #the king and the rooks it can castle with are placed first, unmoved
+        castlers = [("k", base_row, 4, KING_ID, kingside in castling or queenside in castling),
+                ("r", base_row, 7, ROOKK_ID, kingside in castling),
+                ("r", base_row, 0, ROOKQ_ID, queenside in castling)]
+        for letter, row, col, index, can_castle in castlers:
+            if can_castle and (letter, row, col) in found:
+                pieces[index] = Piece(colour, letter, index, row, col)
+                found.remove((letter, row, col))
+        #then everything else, with a free index of the same type of piece preferred
+        leftover = []
+        for letter, row, col in found:
+            free = [index for index in slots[letter] if pieces[index] == None]
+            if len(free) == 0:
+                leftover += [(letter, row, col)]
+                continue
+            pieces[free[0]] = self._fen_piece(colour, letter, free[0], row, col)
+        for letter, row, col in leftover:
+            index = pieces.index(None)
+            pieces[index] = self._fen_piece(colour, letter, index, row, col)
+        #any index not used is a dead piece
+        for letter in slots:
+            for index in slots[letter]:
+                if pieces[index] == None:
+                    pieces[index] = Piece(colour, letter, index, base_row, 0)
+                    pieces[index].set_alive(False)
+
+    """
+    create a piece loaded from a FEN, which has not moved if it is a pawn on its
+    starting row, and has moved if it is in a castling index without being able
+    to castle
+    """
+    def _fen_piece(self, colour, letter, index, row, col):
+        if index in [KING_ID, ROOKK_ID, ROOKQ_ID]:
+            moves = 1
+        elif letter == "p" and row != row_conv(colour, 1):
+            moves = 1
+        else:
+            moves = 0
+        return Piece(colour, letter, index, row, col, moves)
 
     """
     given all the pieces, position them on the board
@@ -58,7 +263,8 @@ class Board:
         for colour in range(NUM_COLOURS):
             for i in range(NUM_PIECES):
                 piece = self._pieces[colour][i]
-                self._board[piece.get_row()][piece.get_col()] = piece
+                if piece.is_alive():
+                    self._board[piece.get_row()][piece.get_col()] = piece
 
     """
     print out the board
@@ -93,13 +299,14 @@ class Board:
     required for the 50 turn rule
     """
     def half_moves_since_event(self):
-        count = 0
-        while count < len(self._moves):
-            move = self._moves[-1 - count]
-            if move.piece.get_letter() == "p" or move.kill != None:
-                break
-            count += 1
-        return count
+        return self._halfmove_clock
+
+    """
+    returns the number of the full move being played, which starts at 1 and
+    goes up after each black move
+    """
+    def fullmove_number(self):
+        return self._start_fullmove + (self._start_turn + len(self._moves)) // NUM_COLOURS
 
     """
     returns a string containing the entire board information 
@@ -131,32 +338,25 @@ class Board:
                 fen += "/"
         
         #the next thing in the FEN notation is the player whose turn it is
-        fen += " w " if len(self._moves) == 0 or self.last_move().piece.get_colour() == BLACK else " b "
+        fen += " w " if self.turn() == WHITE else " b "
 
         #the next part is castling information, relating to whether moves have been made
         castling = ""
-        if not self._pieces[WHITE][KING_ID].has_moved() and \
-                not self._pieces[WHITE][ROOKK_ID].has_moved():
-            castling += "K"
-        if not self._pieces[WHITE][KING_ID].has_moved() and \
-                not self._pieces[WHITE][ROOKQ_ID].has_moved():
-            castling += "Q"
-        if not self._pieces[BLACK][KING_ID].has_moved() and \
-                not self._pieces[BLACK][ROOKK_ID].has_moved():
-            castling += "k"
-        if not self._pieces[BLACK][KING_ID].has_moved() and \
-                not self._pieces[BLACK][ROOKQ_ID].has_moved():
-            castling += "q"
+        for colour, letters in [(WHITE, "KQ"), (BLACK, "kq")]:
+            if self.can_castle(colour, ROOKK_ID):
+                castling += letters[0]
+            if self.can_castle(colour, ROOKQ_ID):
+                castling += letters[1]
         #then if there is no castling we use a "-" instead
         if castling == "":
             castling += "-"
         fen += castling + " "
 
-        #the next piece of information is en passant information
-        last_move = self.last_move()
-        if not len(self._moves) == 0 and last_move.piece.get_letter() == "p" and \
-                abs(last_move.start_row - last_move.end_row) == 2:
-            fen += pos_to_square((last_move.start_row + last_move.end_row)//2, last_move.start_col)
+        #the next piece of information is en passant information, the square
+        #behind the pawn that just double stepped
+        passant_col = self.en_passant_col()
+        if passant_col != NO_PASSANT:
+            fen += pos_to_square(5 if self.turn() == WHITE else 2, passant_col)
         else:
             fen += "-"
 
@@ -164,7 +364,7 @@ class Board:
         fen += " %d " % self.half_moves_since_event()
 
         #finally we add the total turn number we are up to
-        fen += str(len(self._moves)//2 + 1)
+        fen += str(self.fullmove_number())
 
         
         return fen
@@ -182,6 +382,24 @@ class Board:
         else:
             return self._board[row][col].get_colour()
 
+    """
+    the squares with a piece on them as a bitmask, bit row * 8 + col
+    """
+    def occupancy(self):
+        mask = 0
+        for row in range(NUM_ROWS):
+            for col in range(NUM_COLS):
+                if self._board[row][col] != None:
+                    mask |= 1 << (row * NUM_COLS + col)
+        return mask
+
+    """
+    the grid of pieces on the board, indexed [row][col] with None for
+    an empty square. it is the board's own grid, so must not be changed
+    """
+    def get_squares(self):
+        return self._board
+
     """
     return the index of the piece at the square at the given position
     this does not contain any colour information, which can be obtained
@@ -207,6 +425,20 @@ class Board:
         else:
             return None
 
+    """
+    returns the position before the first move in FEN, which is START_FEN
+    for a normal game
+    """
+    def start_fen(self):
+        return self._start_fen
+
+    """
+    returns every move made since the start position in order, as UCI
+    strings, so the game can be replayed from start_fen
+    """
+    def uci_moves(self):
+        return [move.short_representation() for move in self._moves]
+
     """
     return the piece of the given colour and index
     """
@@ -220,6 +452,101 @@ class Board:
     def en_passant_col(self):
         return self._en_passant_col
 
+    """
+    returns the colour whose turn it is to move
+    """
+    def turn(self):
+        return (self._start_turn + len(self._moves)) % NUM_COLOURS
+
+    """
+    determines whether a colour still has the right to castle with the given
+    rook, meaning neither the king or rook has moved and the rook is alive
+    """
+    def can_castle(self, colour, rookID):
+        return self._castling & castling_bit(colour, rookID) != 0
+
+    """
+    returns the Zobrist hash of the position, which is the same whenever the
+    same pieces are on the same squares with the same side to move, castling
+    rights and en passant
+    """
+    def position_hash(self):
+        return self._hash
+
+    """
+    returns the number of times the current position has been reached,
+    including now
+    """
+    def repetition_count(self):
+        return self._hash_counts[self._hash]
+
+    """
+    calculate the Zobrist hash of the position from scratch
+    """
+    def _compute_hash(self):
+        key = 0
+        for colour in range(NUM_COLOURS):
+            for piece in self._pieces[colour]:
+                if piece.is_alive():
+                    key ^= PIECE_KEYS[colour][piece.get_letter()][piece.get_row() * NUM_COLS + piece.get_col()]
+        if self.turn() == BLACK:
+            key ^= BLACK_TO_MOVE_KEY
+        return key ^ self._state_hash()
+
+    """
+    the static score of the position in centipawns from the point of view of
+    the given colour, from the material and where the pieces stand, blended
+    between the middlegame and endgame by the material left
+    """
+    def evaluate(self, colour):
+        score = tapered(self._midgame, self._endgame, self._phase)
+        return score if colour == WHITE else -score
+
+    """
+    the game phase, from MAX_PHASE with all the pieces to 0 with only kings
+    and pawns
+    """
+    def game_phase(self):
+        return self._phase
+
+    """
+    calculate the middlegame and endgame scores and the game phase from scratch
+    """
+    def _compute_evaluation(self):
+        midgame = 0
+        endgame = 0
+        phase = 0
+        for colour in range(NUM_COLOURS):
+            for piece in self._pieces[colour]:
+                if piece.is_alive():
+                    square = piece.get_row() * NUM_COLS + piece.get_col()
+                    midgame += MIDGAME_TABLES[colour][piece.get_letter()][square]
+                    endgame += ENDGAME_TABLES[colour][piece.get_letter()][square]
+                    phase += PHASE_WEIGHTS[piece.get_letter()]
+        return midgame, endgame, phase
+
+    """
+    the part of the hash for the castling rights and en passant. en passant is
+    only included when there is a pawn in place to take, as otherwise the
+    position is no different from the same pieces without the double step
+    """
+    def _state_hash(self):
+        key = 0
+        for colour in range(NUM_COLOURS):
+            for rookID in [ROOKK_ID, ROOKQ_ID]:
+                if self.can_castle(colour, rookID):
+                    key ^= CASTLING_KEYS[colour][rookID]
+        passant_col = self.en_passant_col()
+        if passant_col != NO_PASSANT:
+            row = 4 if self.turn() == WHITE else 3
+            for col in [passant_col - 1, passant_col + 1]:
+                piece = self.piece_at_square(row, col)
+                if piece not in [OFF_BOARD, NO_PIECE] and piece.get_letter() == "p" and \
+                        piece.get_colour() == self.turn():
+                    key ^= EN_PASSANT_KEYS[passant_col]
+                    break
+        return key
+
     """
     move the rook with the castle
     """
@@ -236,6 +563,12 @@ class Board:
         #first update the board with that knowledge
         self._board[rook.get_row()][rook.get_col()] = None
         self._board[rook.get_row()][end_col] = rook
+        start = rook.get_row() * NUM_COLS + rook.get_col()
+        end = rook.get_row() * NUM_COLS + end_col
+        rook_keys = PIECE_KEYS[rook.get_colour()]["r"]
+        self._hash ^= rook_keys[start] ^ rook_keys[end]
+        self._midgame += MIDGAME_TABLES[rook.get_colour()]["r"][end] - MIDGAME_TABLES[rook.get_colour()]["r"][start]
+        self._endgame += ENDGAME_TABLES[rook.get_colour()]["r"][end] - ENDGAME_TABLES[rook.get_colour()]["r"][start]
         #now update the rook's knowledge of its own position
         rook.move_to(rook.get_row(), end_col)
 
@@ -258,28 +591,79 @@ class Board:
         #now update the rook's knowledge of its own position
         rook.move_to(rook.get_row(), end_col, undo=True)
 
+    """
+    update the castling rights, en passant column and halfmove clock for a
+    move that is about to be executed
+    """
+    def _update_state(self, move):
+        colour = move.piece.get_colour()
+        #moving the king or a rook loses the right to castle with it, and so
+        #does having the rook captured
+        if self._castling:
+            if move.piece.get_index() == KING_ID:
+                self._castling &= ~(castling_bit(colour, ROOKK_ID) | castling_bit(colour, ROOKQ_ID))
+            for rookID in [ROOKK_ID, ROOKQ_ID]:
+                if move.piece is self._pieces[colour][rookID]:
+                    self._castling &= ~castling_bit(colour, rookID)
+                if move.kill is self._pieces[1 - colour][rookID]:
+                    self._castling &= ~castling_bit(1 - colour, rookID)
+        if move.piece.get_letter() == "p":
+            self._halfmove_clock = 0
+            if abs(move.start_row - move.end_row) == 2:
+                self._en_passant_col = move.start_col
+            else:
+                self._en_passant_col = NO_PASSANT
+        else:
+            self._halfmove_clock = 0 if move.kill != None else self._halfmove_clock + 1
+            self._en_passant_col = NO_PASSANT
+
     """
     execute a move, updating the board to reflect the move
     """
     def execute_move(self, move):
+        #save the state for the undo, and take out the castling and en passant
+        #part of the hash, which is put back once the move is made
+        self._state_history += [(self._castling, self._en_passant_col, self._halfmove_clock, self._hash,
+                self._midgame, self._endgame, self._phase)]
+        self._hash ^= self._state_hash()
+        self._update_state(move)
         #check for castling and do the rook moves if so
         if move.castle != NO_CASTLE:
             self.castle_rook_move(move)
         #first remove the piece from the board
         self._board[move.start_row][move.start_col] = None
+        colour = move.piece.get_colour()
+        start = move.start_row * NUM_COLS + move.start_col
+        end = move.end_row * NUM_COLS + move.end_col
+        keys = PIECE_KEYS[colour]
+        self._hash ^= keys[move.piece.get_letter()][start]
+        self._midgame -= MIDGAME_TABLES[colour][move.piece.get_letter()][start]
+        self._endgame -= ENDGAME_TABLES[colour][move.piece.get_letter()][start]
         #then update the piece's own knowledge of its position
         move.piece.move_to(move.end_row, move.end_col)
         #check for a promotion, and if there is a promotion, change the piece
         if move.promotion != None:
             move.piece.set_letter(move.promotion)
+            self._phase += PHASE_WEIGHTS[move.promotion]
+        self._hash ^= keys[move.piece.get_letter()][end]
+        self._midgame += MIDGAME_TABLES[colour][move.piece.get_letter()][end]
+        self._endgame += ENDGAME_TABLES[colour][move.piece.get_letter()][end]
         #if it's a kill, remove the killed piece from the game
         if move.kill != None:
             move.kill.set_alive(False)
             self._board[move.kill.get_row()][move.kill.get_col()] = None
+            square = move.kill.get_row() * NUM_COLS + move.kill.get_col()
+            letter = move.kill.get_letter()
+            self._hash ^= PIECE_KEYS[1 - colour][letter][square]
+            self._midgame -= MIDGAME_TABLES[1 - colour][letter][square]
+            self._endgame -= ENDGAME_TABLES[1 - colour][letter][square]
+            self._phase -= PHASE_WEIGHTS[letter]
         #then update the board's knowledge of the piece
         self._board[move.end_row][move.end_col] = move.piece
 
         self._moves += [move]
+        self._hash ^= self._state_hash() ^ BLACK_TO_MOVE_KEY
+        self._hash_counts[self._hash] = self._hash_counts.get(self._hash, 0) + 1
 
     """
     undoes a move, updating the board to the state it was before the move
@@ -304,68 +688,199 @@ class Board:
         self._board[move.start_row][move.start_col] = move.piece
         #remove the move from the list of moves
         self._moves.pop() 
+        if self._hash_counts[self._hash] == 1:
+            del self._hash_counts[self._hash]
+        else:
+            self._hash_counts[self._hash] -= 1
+        (self._castling, self._en_passant_col, self._halfmove_clock, self._hash,
+                self._midgame, self._endgame, self._phase) = self._state_history.pop()
 
     """
     returns all LEGAL moves a player can make, this is different from possible
     moves, in that this does not allow a player to move into check
     """
     def all_legal_moves(self, colour):
-        legal_moves = []
-        for piece in self._pieces[colour]:
-            if piece.is_alive():
-                legal_moves += piece.legal_moves(self)
-        return legal_moves
+        return self.filter_legal_moves(colour, self.all_possible_moves(colour))
 
     """
     determines if a given move is LEGAL, slightly different from possible,
     in that it determines whether this move ends up in check
     """
     def is_move_legal(self, move):
-        #do a couple of preliminary checks for castling
-        if move.castle != NO_CASTLE and self.castle_checks(move) == False:
-            return False #we cannot perform this castle, even if it ends legally
-        #first try executing the move
+        return len(self.filter_legal_moves(move.piece.get_colour(), [move])) == 1
+
+    """
+    determines the legality of a move by playing it and looking for check,
+    only used for en passant, where two pieces leave the same row at once
+    """
+    def _is_move_legal_by_execution(self, move):
         self.execute_move(move)
-        #then evaluate whether the other player now has check
-        legal = True
-        if self.is_check(1 - move.piece.get_colour()):
-            legal = False
-        #then undo the fake move
+        legal = not self.is_check(1 - move.piece.get_colour())
         self.undo_move()
         return legal
 
+    """
+    returns the LEGAL moves out of a list of possible moves for a colour.
+    the checks and pins on the king are found once, and then each move is tested:
+    - the king cannot move onto a square attacked by the other colour
+    - a pinned piece can only move along its pin
+    - if in check, the move must capture the checking piece or block it
+      (and in double check only the king can move)
+    castling and en passant are handled separately
+    """
+    def filter_legal_moves(self, colour, moves):
+        checks, pins = self._checks_and_pins(colour)
+        attacked = None
+        legal_moves = []
+        for move in moves:
+            end = (move.end_row, move.end_col)
+            if move.piece.get_index() == KING_ID:
+                #find the attacked squares only once a king move comes up
+                if attacked == None:
+                    attacked = self._attacked_squares(1 - colour, move.piece)
+                if end in attacked:
+                    continue
+                if move.castle != NO_CASTLE and not self.castle_checks(move):
+                    continue
+            elif move.kill != None and move.kill.get_pos() != end:
+                #en passant, the captured pawn is not on the end square
+                if not self._is_move_legal_by_execution(move):
+                    continue
+            elif len(checks) > 1:
+                continue #double check, only the king can move
+            elif len(checks) == 1 and end not in checks[0]:
+                continue #does not block or capture the checking piece
+            elif move.piece in pins and end not in pins[move.piece]:
+                continue #moves off the line it is pinned along
+            legal_moves += [move]
+        return legal_moves
+
+    """
+    finds the checks on the king of the given colour, and the pieces of that
+    colour that are pinned to the king.
+    returns a list with an entry for each check, containing the squares that
+    would capture or block that checking piece, and a dictionary from each
+    pinned piece to the squares it can move to without leaving its pin
+    """
+    def _checks_and_pins(self, colour):
+        king_row, king_col = self._pieces[colour][KING_ID].get_pos()
+        checks = []
+        pins = {}
+        #look outward from the king for sliding pieces
+        for directions, sliders in [(STRAIGHT_DIRECTIONS, ["r", "q"]), (DIAGONAL_DIRECTIONS, ["b", "q"])]:
+            for dr, dc in directions:
+                row = king_row + dr
+                col = king_col + dc
+                ray = set()
+                blocker = None #the first piece of our own colour along the ray
+                while 0 <= row < NUM_ROWS and 0 <= col < NUM_COLS:
+                    ray.add((row, col))
+                    piece = self._board[row][col]
+                    if piece != None:
+                        if piece.get_colour() == colour:
+                            if blocker != None:
+                                break #two of our own pieces, nothing is pinned
+                            blocker = piece
+                        else:
+                            if piece.get_letter() in sliders:
+                                if blocker == None:
+                                    checks += [ray]
+                                else:
+                                    pins[blocker] = ray
+                            break
+                    row += dr
+                    col += dc
+        #knights and pawns can check, but never pin
+        pawn_row = king_row + (1 if colour == WHITE else -1)
+        jumps = [(dr, dc, "n") for dr, dc in KNIGHT_JUMPS] + \
+                [(pawn_row - king_row, dc, "p") for dc in [-1, 1]]
+        for dr, dc, letter in jumps:
+            row = king_row + dr
+            col = king_col + dc
+            if 0 <= row < NUM_ROWS and 0 <= col < NUM_COLS:
+                piece = self._board[row][col]
+                if piece != None and piece.get_colour() != colour and piece.get_letter() == letter:
+                    checks += [{(row, col)}]
+        return checks, pins
+
+    """
+    returns the set of all (row, col) squares attacked by the given colour.
+    ignore - a piece treated as not being on the board, so that a king cannot
+    step backwards along the line of a sliding piece that is checking it
+    """
+    def _attacked_squares(self, colour, ignore=None):
+        attacked = set()
+        for piece in self._pieces[colour]:
+            if not piece.is_alive():
+                continue
+            row, col = piece.get_pos()
+            letter = piece.get_letter()
+            #the leaping pieces, squares off the board don't matter as nothing moves there
+            if letter == "p":
+                direction = 1 if colour == WHITE else -1
+                attacked.update([(row + direction, col - 1), (row + direction, col + 1)])
+            elif letter == "n":
+                attacked.update([(row + dr, col + dc) for dr, dc in KNIGHT_JUMPS])
+            elif letter == "k":
+                attacked.update([(row + dr, col + dc) for dr, dc in KING_STEPS])
+            else:
+                #the sliding pieces, which attack up to and including the first piece hit
+                directions = []
+                if letter in ["r", "q"]:
+                    directions += STRAIGHT_DIRECTIONS
+                if letter in ["b", "q"]:
+                    directions += DIAGONAL_DIRECTIONS
+                for dr, dc in directions:
+                    r = row + dr
+                    c = col + dc
+                    while 0 <= r < NUM_ROWS and 0 <= c < NUM_COLS:
+                        attacked.add((r, c))
+                        if self._board[r][c] != None and self._board[r][c] != ignore:
+                            break
+                        r += dr
+                        c += dc
+        return attacked
+
     """
     additional checks for if a castle is legal, checks for:
     - if the king is currently in check
     - if the king would move through check
     """
     def castle_checks(self, move):
-        #check that the king isn't currently in check
-        if self.is_check(1 - move.piece.get_colour()):
-            return False
-        #generate a fake move to see if the king moves through check
-        #the location of this can be determined by if we are doing a kingside
-        #or queenside castle
         if move.castle == ROOKQ_ID:
-            move_through = Move(move.piece, move.start_row, move.start_col,
-                    move.end_row, move.start_col - 1)
+            direction = -1
         elif move.castle == ROOKK_ID:
-            move_through = Move(move.piece, move.start_row, move.start_col,
-                    move.end_row, move.start_col + 1)
+            direction = 1
         else:
             raise ValueError("should not check castling when the move is not a castle")
-        #then check if we move through check
-        return self.is_move_legal(move_through)
+        #the king can't be in check on its current square or the one it moves through
+        opponent = 1 - move.piece.get_colour()
+        for col in [move.start_col, move.start_col + direction]:
+            if self.is_square_attacked(move.start_row, col, opponent):
+                return False
+        return True
+
+    """
+    turn a move encoded with Move.encode back into a move on this board,
+    for the colour whose turn it is.
+    returns None if the code is not a possible move in this position
+    """
+    def decode_move(self, code):
+        start_row, start_col = divmod(code & 63, NUM_COLS)
+        end_row, end_col = divmod((code >> 6) & 63, NUM_COLS)
+        piece = self._board[start_row][start_col]
+        if piece == None or piece.get_colour() != self.turn():
+            return None
+        for move in piece.possible_moves(self):
+            if move.end_row == end_row and move.end_col == end_col and move.encode() == code:
+                return move
+        return None
 
     """
     returns all possible moves that can be made by a colour
     """
     def all_possible_moves(self, colour):
-        all_moves = []
-        for piece in self._pieces[colour]:
-            if piece.is_alive():
-                all_moves += piece.possible_moves(self)
-        return all_moves
+        return self._possible_moves(colour)
 
     """
     returns all legal moves that can be made by a colour,
@@ -379,6 +894,71 @@ class Board:
             d[move.short_representation()] = move
         return d
 
+    """
+    yields the legal moves of a colour in a good order for searching, in
+    stages so that the later stages are only worked out if they are needed:
+      the preferred move (e.g. the best move from a transposition table)
+      captures and promotions, most valuable victim by least valuable attacker
+      the killer moves (quiet moves that were good in sibling positions)
+      the other quiet moves, highest history score first
+    preferred - a move encoded with Move.encode, or None
+    killers - a sequence of encoded moves
+    history - anything with a score(move) method rating quiet moves, or None
+    quiet - False to only yield the preferred move and the captures
+    """
+    def ordered_moves(self, colour, preferred=None, killers=(), history=None, quiet=True):
+        #the preferred move is only checked, without generating anything else
+        if preferred != None:
+            move = self.decode_move(preferred)
+            if move != None and self.is_move_legal(move):
+                yield move
+            else:
+                preferred = None
+        captures = self.legal_captures(colour)
+        captures.sort(key=capture_order, reverse=True)
+        for move in captures:
+            if preferred == None or move.encode() != preferred:
+                yield move
+        if not quiet:
+            return
+        quiets = self.legal_quiet_moves(colour)
+        #killers are only played if they are quiet moves in this position
+        played = set() if preferred == None else set([preferred])
+        if len(killers) > 0:
+            codes = {move.encode(): move for move in quiets}
+            for code in killers:
+                if code in codes and code not in played:
+                    played.add(code)
+                    yield codes[code]
+        if history != None:
+            quiets.sort(key=history.score, reverse=True)
+        for move in quiets:
+            if len(played) == 0 or move.encode() not in played:
+                yield move
+
+    """
+    returns the LEGAL captures and promotions of a colour, the first moves
+    searched, without generating any other moves
+    """
+    def legal_captures(self, colour):
+        return self.filter_legal_moves(colour, self._possible_moves(colour, quiets=False))
+
+    """
+    returns the LEGAL moves of a colour which are not captures or promotions
+    """
+    def legal_quiet_moves(self, colour):
+        return self.filter_legal_moves(colour, self._possible_moves(colour, captures=False))
+
+    """
+    the possible moves of the pieces of a colour, of the kinds asked for
+    """
+    def _possible_moves(self, colour, captures=True, quiets=True):
+        moves = []
+        for piece in self._pieces[colour]:
+            if piece.is_alive():
+                moves += piece.possible_moves(self, captures, quiets)
+        return moves
+
     """
     prints all possible moves that can be made by a colour
     """
@@ -398,17 +978,116 @@ class Board:
     """
     determines whether the given colour could kill the king in one move
     with the current board
-    checking works with possible moves, not legal moves, as check basically
-    defines a legal move, and working with legal moves would infinite loop
     """
     def is_check(self, colour):
-        all_moves = self.all_possible_moves(colour)
-        #check all moves for potential king kills
-        for move in all_moves:
-            if move.kill != None and move.kill.get_index() == KING_ID:
-                return True
+        king_row, king_col = self._pieces[1 - colour][KING_ID].get_pos()
+        return self.is_square_attacked(king_row, king_col, colour)
+
+    """
+    determines whether any piece of the given colour attacks the square at
+    the given position. looks outward from the square for each kind of attacker,
+    stopping as soon as one is found
+    """
+    def is_square_attacked(self, row, col, colour):
+        board = self._board
+        #pawns attack diagonally forwards, so look diagonally backwards for them
+        pawn_row = row - 1 if colour == WHITE else row + 1
+        attackers = [(pawn_row - row, dc, "p") for dc in [-1, 1]] + \
+                [(dr, dc, "n") for dr, dc in KNIGHT_JUMPS] + \
+                [(dr, dc, "k") for dr, dc in KING_STEPS]
+        for dr, dc, letter in attackers:
+            r = row + dr
+            c = col + dc
+            if 0 <= r < NUM_ROWS and 0 <= c < NUM_COLS:
+                piece = board[r][c]
+                if piece != None and piece.get_colour() == colour and piece.get_letter() == letter:
+                    return True
+        #then the sliding pieces, only the first piece along each line matters
+        for directions, sliders in [(STRAIGHT_DIRECTIONS, ["r", "q"]), (DIAGONAL_DIRECTIONS, ["b", "q"])]:
+            for dr, dc in directions:
+                r = row + dr
+                c = col + dc
+                while 0 <= r < NUM_ROWS and 0 <= c < NUM_COLS:
+                    piece = board[r][c]
+                    if piece != None:
+                        if piece.get_colour() == colour and piece.get_letter() in sliders:
+                            return True
+                        break
+                    r += dr
+                    c += dc
         return False
 
+    """
+    returns the pieces of the given colour which attack the square at the
+    given position. pieces in removed are treated as already gone from the
+    board, so a slider behind one of them is found instead
+    """
+    def attackers(self, row, col, colour, removed=()):
+        board = self._board
+        found = []
+        #pawns attack diagonally forwards, so look diagonally backwards for them
+        pawn_row = row - 1 if colour == WHITE else row + 1
+        if 0 <= pawn_row < NUM_ROWS:
+            for c in [col - 1, col + 1]:
+                if 0 <= c < NUM_COLS:
+                    piece = board[pawn_row][c]
+                    if piece != None and piece.get_colour() == colour and piece.get_letter() == "p":
+                        found += [piece]
+        for targets, letter in [(KNIGHT_TARGETS, "n"), (KING_TARGETS, "k")]:
+            for r, c in targets[row][col]:
+                piece = board[r][c]
+                if piece != None and piece.get_colour() == colour and piece.get_letter() == letter:
+                    found += [piece]
+        #then the first piece still on the board along each line
+        for rays, sliders in [(STRAIGHT_RAYS, ["r", "q"]), (DIAGONAL_RAYS, ["b", "q"])]:
+            for ray in rays[row][col]:
+                for r, c in ray:
+                    piece = board[r][c]
+                    if piece != None and piece not in removed:
+                        if piece.get_colour() == colour and piece.get_letter() in sliders:
+                            found += [piece]
+                        break
+        return [piece for piece in found if piece not in removed]
+
+    """
+    static exchange evaluation, the material the side making the move can
+    expect to win from the exchange it starts on the end square, if both
+    sides keep recapturing with their least valuable piece for as long as
+    it pays. pins and checks are not taken into account
+    """
+    def see(self, move):
+        row = move.end_row
+        col = move.end_col
+        colour = move.piece.get_colour()
+        removed = set([move.piece])
+        #gains[i] is what the side making capture i has won once it is made
+        gains = [0 if move.kill == None else EXCHANGE_VALUES[move.kill.get_letter()]]
+        on_square = move.piece.get_letter()
+        if move.promotion != None:
+            gains[0] += EXCHANGE_VALUES[move.promotion] - EXCHANGE_VALUES["p"]
+            on_square = move.promotion
+        if move.kill != None:
+            #an en passant victim is not on the square, but may block a line to it
+            removed.add(move.kill)
+        side = 1 - colour
+        while True:
+            attackers = self.attackers(row, col, side, removed)
+            if len(attackers) == 0:
+                break
+            attacker = min(attackers, key=lambda piece: EXCHANGE_VALUES[piece.get_letter()])
+            #the king can only take if it will not be taken back
+            if attacker.get_letter() == "k" and len(self.attackers(row, col, 1 - side, removed)) > 0:
+                break
+            gains += [EXCHANGE_VALUES[on_square] - gains[-1]]
+            on_square = attacker.get_letter()
+            removed.add(attacker)
+            side = 1 - side
+        #work back from the end of the exchange, each side stops taking if
+        #taking would lose it material
+        for i in range(len(gains) - 1, 0, -1):
+            gains[i - 1] = -max(-gains[i - 1], gains[i])
+        return gains[0]
+
     """
     determine if any game ending configuration has been reached
     colour - the colour whose turn it is
@@ -418,12 +1097,16 @@ class Board:
         legal_moves = self.all_legal_moves(colour)
         if len(legal_moves) == 0:
             #there are no moves, determine if checkmate or stalemate
-            if self.is_check(1 - colour):
+            king_row, king_col = self._pieces[colour][KING_ID].get_pos()
+            if self.is_square_attacked(king_row, king_col, 1 - colour):
                 return CHECKMATE
             else:
                 return STALEMATE
-        #check for the fifty move rule
-        if self.half_moves_since_event() >= 50:
+        #a position reached for the third time is a draw
+        if self.repetition_count() >= 3:
+            return REPETITION
+        #check for the fifty move rule, which is fifty moves by each player
+        if self.half_moves_since_event() >= 100:
             return FIFTY_MOVE_RULE
         #then check for insufficient material, do this by creating a 
         #string of all the alive pieces
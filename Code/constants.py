@@ -12,6 +12,9 @@ NUM_ROWS = 8
 NUM_COLS = 8
 NUM_PIECES = 16
 
+#the position at the start of a game, in FEN
+START_FEN = "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1"
+
 #other constants
 NO_PASSANT = -2
 NO_PIECE = -1
@@ -34,3 +37,9 @@ KING_ID = 12
 BISHOPK_ID = 13
 KNIGHTK_ID = 14
 ROOKK_ID = 15
+
+#movement directions as (change in row, change in col)
+STRAIGHT_DIRECTIONS = [(0,1), (0,-1), (-1,0), (1,0)]
+DIAGONAL_DIRECTIONS = [(1,1), (1,-1), (-1,1), (-1,-1)]
+KNIGHT_JUMPS = [(2,1), (2,-1), (-2,1), (-2,-1), (1,2), (1,-2), (-1,2), (-1,-2)]
+KING_STEPS = STRAIGHT_DIRECTIONS + DIAGONAL_DIRECTIONS
@@ -1,4 +1,5 @@
-from gpiozero import LED, Button
+from abc import ABC, abstractmethod
+import asyncio
 import time
 
 #decoder inputs
@@ -13,6 +14,86 @@ MUX_A = 25
 M1_OUT = 12 #output of multiplexer controlling columns 0-5
 M2_OUT = 4 #output of multiplexer controlling columns 6-11
 
+#the control pins, lowest bit first, so that the decoder row and the mux
+#value can be written together as row | mux << 3
+CONTROL_PINS = [DEC_A, DEC_B, DEC_C, MUX_A, MUX_B, MUX_C]
+MUX_SHIFT = 3
+#the output pins, read together as bit 0 for the first mux and bit 1 for the second
+OUTPUT_PINS = [M1_OUT, M2_OUT]
+
+#size of the detection grid, the columns are split between the two muxes
+NUM_DETECTION_ROWS = 8
+NUM_DETECTION_COLS = 12
+MUX_COLS = 6
+
+#the 3 bit values in Gray code order, where each differs from the last in
+#one bit, so stepping through them changes one pin at a time
+GRAY_ORDER = [0, 1, 3, 2, 6, 7, 5, 4]
+
+#the reading of a square with a piece on it
+OCCUPIED = 0
+
+#the chess board takes up the middle columns of the grid, the two columns
+#on each side hold the captured pieces
+BOARD_FIRST_COL = 2
+BOARD_COLS = 8
+
+"""
+the bit of a square of the detection grid in a scan mask
+"""
+def square_bit(row, col):
+    return 1 << (row * NUM_DETECTION_COLS + col)
+
+#scan masks covering the whole grid, and the captured piece columns
+ALL_SQUARES_MASK = (1 << (NUM_DETECTION_ROWS * NUM_DETECTION_COLS)) - 1
+GRAVEYARD_MASK = sum(square_bit(row, col) for row in range(NUM_DETECTION_ROWS)
+        for col in list(range(BOARD_FIRST_COL)) + list(range(BOARD_FIRST_COL + BOARD_COLS, NUM_DETECTION_COLS)))
+
+"""
+the scan mask of the chess board squares in a bitmask with bit row * 8 + col,
+such as an occupancy from Board.occupancy
+"""
+def board_scan_mask(board_mask):
+    mask = 0
+    for row in range(NUM_DETECTION_ROWS):
+        for col in range(BOARD_COLS):
+            if (board_mask >> (row * BOARD_COLS + col)) & 1:
+                mask |= square_bit(row, BOARD_FIRST_COL + col)
+    return mask
+
+"""
+the number of pins which change going from one control value to the next
+"""
+def _transitions(previous, value):
+    return bin(previous ^ value).count("1")
+
+"""
+plan a scan of the squares in the mask, as a list of the control values
+(row | mux << 3) to select in turn. only the rows and mux values with a
+square in the mask are selected, and they are put in the order changing the
+fewest pins: rows in Gray code order, and within each row the mux values in
+Gray code order, forwards or backwards depending on which end is closer to
+where the last row finished
+"""
+def scan_plan(mask, start=0):
+    plan = []
+    previous = start
+    for row in GRAY_ORDER:
+        muxes = [mux for mux in GRAY_ORDER if mux < MUX_COLS and
+                mask & (square_bit(row, mux) | square_bit(row, mux + MUX_COLS))]
+        if len(muxes) == 0:
+            continue
+        values = [row | (mux << MUX_SHIFT) for mux in muxes]
+        if _transitions(previous, values[-1]) < _transitions(previous, values[0]):
+            values.reverse()
+        plan += values
+        previous = values[-1]
+    return plan
+
+#the kinds of change to a square
+LIFT = 0
+PLACE = 1
+
 
 """
 generally set an output to a value, 0 for off, otherwise on
@@ -33,101 +114,423 @@ def read_input(pin):
     return 1 - int(pin.is_pressed) #this is opposite to intuitive
 
 """
-set the values for a 3 bit control of a logic chip.
-pin0, pin1, pin2 - the LEDs/pins to control
-val - the value to write to these pins, 0 <= val <= 7
+a way of driving the GPIO pins, so that the scanning can use whichever
+library is fastest on the hardware, or no hardware at all.
+the pins are written and read in groups, so a backend that can reach a
+whole bank of pins at once needs only one call for each group
 """
-def three_val_input(pin0, pin1, pin2, val):
-    set_output(pin0, val & (1<<0))
-    set_output(pin1, val & (1<<1))
-    set_output(pin2, val & (1<<2))
+class GPIOBackend(ABC):
 
+    """
+    set the output pins to the bits of value, the first pin is the lowest bit
+    """
+    @abstractmethod
+    def write(self, pins, value):
+        pass
 
-class Detection:
     """
-    init function, initialises the mux to zero
+    read the input pins, returned as the bits of a number with the first
+    pin as the lowest bit. a pin reads 1 when it is high
     """
-    def __init__(self):
-        self._init_mux()
-        self._init_decoder()
-        self._board = []
-        for i in range(8):
-            self._board += [[0]*12]
-      
+    @abstractmethod
+    def read(self, pins):
+        pass
+
     """
-    initialise the mux to be all set as outputs
+    release the pins
     """
-    def _init_mux(self):
-        #declare shared MUX inputs as LEDs for on/off functionality
-        self._muxC = LED(MUX_C)
-        self._muxB = LED(MUX_B)
-        self._muxA = LED(MUX_A)
-        #declare the MUX outputs as buttons so that they can be read from
-        self._m1_out = Button(M1_OUT)
-        self._m2_out = Button(M2_OUT)
-    
+    def close(self):
+        pass
+
+"""
+a backend using gpiozero, which drives every pin with its own call.
+only the pins which change are written
+"""
+class GpiozeroBackend(GPIOBackend):
+
+    def __init__(self, outputs=CONTROL_PINS, inputs=OUTPUT_PINS):
+        from gpiozero import LED, Button
+        #declare the outputs as LEDs for on/off functionality
+        self._leds = {pin: LED(pin) for pin in outputs}
+        #declare the inputs as buttons so that they can be read from
+        self._buttons = {pin: Button(pin) for pin in inputs}
+        self._values = {pin: 0 for pin in outputs}
+
+    def write(self, pins, value):
+        for bit, pin in enumerate(pins):
+            pin_value = (value >> bit) & 1
+            if self._values[pin] != pin_value:
+                set_output(self._leds[pin], pin_value)
+                self._values[pin] = pin_value
+
+    def read(self, pins):
+        value = 0
+        for bit, pin in enumerate(pins):
+            value |= read_input(self._buttons[pin]) << bit
+        return value
+
+    def close(self):
+        for device in list(self._leds.values()) + list(self._buttons.values()):
+            device.close()
+
+"""
+a backend using the pigpio daemon, which sets and clears any of the first
+32 pins with one call each and reads them all with one call
+"""
+class PigpioBackend(GPIOBackend):
+
+    def __init__(self, outputs=CONTROL_PINS, inputs=OUTPUT_PINS):
+        import pigpio
+        self._pi = pigpio.pi()
+        if not self._pi.connected:
+            raise Exception("the pigpio daemon is not running")
+        for pin in outputs:
+            self._pi.set_mode(pin, pigpio.OUTPUT)
+        for pin in inputs:
+            self._pi.set_mode(pin, pigpio.INPUT)
+            self._pi.set_pull_up_down(pin, pigpio.PUD_UP)
+
+    def write(self, pins, value):
+        high = 0
+        low = 0
+        for bit, pin in enumerate(pins):
+            if (value >> bit) & 1:
+                high |= 1 << pin
+            else:
+                low |= 1 << pin
+        if high:
+            self._pi.set_bank_1(high)
+        if low:
+            self._pi.clear_bank_1(low)
+
+    def read(self, pins):
+        levels = self._pi.read_bank_1()
+        value = 0
+        for bit, pin in enumerate(pins):
+            value |= ((levels >> pin) & 1) << bit
+        return value
+
+    def close(self):
+        self._pi.stop()
+
+"""
+a backend using lgpio, which writes or reads a claimed group of pins with
+one call. lgpio returns a negative error code when a call fails, which is
+raised as an exception
+"""
+class LgpioBackend(GPIOBackend):
+
+    def __init__(self, outputs=CONTROL_PINS, inputs=OUTPUT_PINS, chip=0):
+        import lgpio
+        self._lgpio = lgpio
+        self._handle = self._check(lgpio.gpiochip_open(chip))
+        try:
+            #a group is known by its first pin, and its bits are in the order claimed
+            self._check(lgpio.group_claim_output(self._handle, outputs))
+            self._check(lgpio.group_claim_input(self._handle, inputs, lgpio.SET_PULL_UP))
+        except:
+            lgpio.gpiochip_close(self._handle)
+            raise
+        self._outputs = outputs
+        self._inputs = inputs
+
     """
-    initialise the decoder inputs to be set as outputs
+    raise the error if an lgpio call failed, otherwise return its result
     """
-    def _init_decoder(self):
-        #declare decoder inputs as LEDs for on/off functionality
-        self._decC = LED(DEC_C)
-        self._decB = LED(DEC_B)
-        self._decA = LED(DEC_A)
+    def _check(self, status):
+        if status < 0:
+            raise Exception("lgpio error: %s" % self._lgpio.error_text(status))
+        return status
+
+    def write(self, pins, value):
+        bits = 0
+        mask = 0
+        for bit, pin in enumerate(pins):
+            position = self._outputs.index(pin)
+            mask |= 1 << position
+            bits |= ((value >> bit) & 1) << position
+        self._check(self._lgpio.group_write(self._handle, self._outputs[0], bits, mask))
+
+    def read(self, pins):
+        #the result is the number of pins in the group and their levels
+        size, levels = self._lgpio.group_read(self._handle, self._inputs[0])
+        self._check(size)
+        value = 0
+        for bit, pin in enumerate(pins):
+            value |= ((levels >> self._inputs.index(pin)) & 1) << bit
+        return value
+
+    def close(self):
+        self._check(self._lgpio.gpiochip_close(self._handle))
+
+"""
+a stand in for the hardware, for testing without a board. the squares
+which are occupied are set with set_occupied, and the outputs read what
+the selected squares would give. an occupied square reads 0, as on the
+real board
+"""
+class FakeBackend(GPIOBackend):
+
+    def __init__(self):
+        self._levels = {}
+        self._occupied = [[False] * NUM_DETECTION_COLS for row in range(NUM_DETECTION_ROWS)]
+        #the number of calls made and pins changed, to compare scanning methods
+        self.writes = 0
+        self.reads = 0
+        self.transitions = 0
+
+    def set_occupied(self, row, col, occupied=True):
+        self._occupied[row][col] = occupied
+
+    def write(self, pins, value):
+        self.writes += 1
+        for bit, pin in enumerate(pins):
+            level = (value >> bit) & 1
+            if self._levels.get(pin, 0) != level:
+                self.transitions += 1
+            self._levels[pin] = level
+
+    def read(self, pins):
+        self.reads += 1
+        row = sum(self._levels.get(pin, 0) << bit for bit, pin in enumerate(CONTROL_PINS[:MUX_SHIFT]))
+        mux = sum(self._levels.get(pin, 0) << bit for bit, pin in enumerate(CONTROL_PINS[MUX_SHIFT:]))
+        value = 0
+        for bit, pin in enumerate(pins):
+            col = mux + (0 if pin == M1_OUT else MUX_COLS)
+            if mux < MUX_COLS and not self._occupied[row][col]:
+                value |= 1 << bit
+        return value
+
+#the backends by name
+BACKENDS = {"gpiozero": GpiozeroBackend, "pigpio": PigpioBackend,
+        "lgpio": LgpioBackend, "fake": FakeBackend}
+
+
+class Detection:
+    """
+    init function, initialises the mux to zero
+    backend - the GPIOBackend to drive the pins with, gpiozero if not given
+    """
+    def __init__(self, backend=None):
+        self._backend = backend if backend != None else GpiozeroBackend()
+        self._board = []
+        for i in range(NUM_DETECTION_ROWS):
+            self._board += [[0]*NUM_DETECTION_COLS]
+        #the number of scans and the time spent on them
+        self._scans = 0
+        self._scan_time = 0
+        #the order of the selections for the squares being scanned
+        self._plan_mask = None
+        self._plan = []
+        self._select(0, 0)
 
     """
     Set the mux inputs to a specific value, 0 <= val <= 7
     """
     def set_mux(self, val):
-        three_val_input(self._muxA, self._muxB, self._muxC, val)
+        self._backend.write(CONTROL_PINS[MUX_SHIFT:], val)
 
     """
     Set the decoder inputs to a specific valu, 0 <= val <= 7
     """
     def set_decoder(self, val):
-        three_val_input(self._decA, self._decB, self._decC, val)
+        self._backend.write(CONTROL_PINS[:MUX_SHIFT], val)
+
+    """
+    set the decoder row and the mux value with a single write
+    """
+    def _select(self, row, mux_val):
+        self._backend.write(CONTROL_PINS, row | (mux_val << MUX_SHIFT))
 
     """
     Read a specific square, for debugging purposes
     """
     def read_square(self, row, col):
-        #the row is controlled by the decoder
-        self.set_decoder(row)
-        #the column is controlled by the muxes
-        self.set_mux(col % 6)
+        #the row is controlled by the decoder, the column by the muxes
+        self._select(row, col % MUX_COLS)
         #then choose output based on the column
         #0-5 are on the first mux
         #6-11 are on the second mux
-        if col < 6:
-            return read_input(self._m1_out)
+        outputs = self._backend.read(OUTPUT_PINS)
+        if col < MUX_COLS:
+            return outputs & 1
         else:
-            return read_input(self._m2_out)
+            return (outputs >> 1) & 1
 
     """
     print the current detected board status
     """
     def print_board(self):
-        for row in range(8):
+        for row in range(NUM_DETECTION_ROWS):
             print(self._board[row])
 
+    """
+    Update the detected board storage, returns the board as a list of rows.
+    each selection needs one write, setting the decoder and mux together,
+    and one read of both mux outputs, giving two squares.
+    mask - the squares to scan (see square_bit), the rest keep their last
+           reading. the whole grid if not given
+    """
+    def update_board(self, mask=ALL_SQUARES_MASK):
+        start = time.perf_counter()
+        #the plan is kept while the same squares are scanned
+        if mask != self._plan_mask:
+            self._plan = scan_plan(mask, self._plan[-1] if len(self._plan) > 0 else 0)
+            self._plan_mask = mask
+        write = self._backend.write
+        read = self._backend.read
+        board = self._board
+        for value in self._plan:
+            write(CONTROL_PINS, value)
+            outputs = read(OUTPUT_PINS)
+            board_row = board[value & ((1 << MUX_SHIFT) - 1)]
+            mux_val = value >> MUX_SHIFT
+            board_row[mux_val] = outputs & 1
+            board_row[mux_val + MUX_COLS] = (outputs >> 1) & 1
+        self._scans += 1
+        self._scan_time += time.perf_counter() - start
+        return self._board
 
     """
-    Update the detected board storage
+    the rate of the scans made so far, in scans per second
     """
-    def update_board(self):
-        global _board
-        for row in range(8):
-            self.set_decoder(row)
-            for mux_val in range(6):
-                self.set_mux(mux_val)
-                self._board[row][mux_val] = read_input(self._m1_out)
-                self._board[row][mux_val + 6] = read_input(self._m2_out)
+    def scans_per_second(self):
+        if self._scan_time <= 0:
+            return 0
+        return self._scans / self._scan_time
+
+    def reset_scan_rate(self):
+        self._scans = 0
+        self._scan_time = 0
+
+    """
+    release the pins
+    """
+    def close(self):
+        self._backend.close()
+
+"""
+the squares of the chess board with a piece on them in a detection grid,
+as a bitmask with bit row * 8 + col, the same as Board.occupancy
+"""
+def occupancy_mask(grid):
+    mask = 0
+    for row in range(NUM_DETECTION_ROWS):
+        for col in range(BOARD_COLS):
+            if grid[row][BOARD_FIRST_COL + col] == OCCUPIED:
+                mask |= 1 << (row * BOARD_COLS + col)
+    return mask
+
+"""
+a change to a square of the detection grid
+kind - LIFT if a piece was taken off the square, PLACE if one was put on
+row/col - the square in the detection grid
+timestamp - the time.monotonic() of the first scan that saw the change
+"""
+class SquareEvent:
+
+    __slots__ = ["kind", "row", "col", "timestamp"]
+
+    def __init__(self, kind, row, col, timestamp):
+        self.kind = kind
+        self.row = row
+        self.col = col
+        self.timestamp = timestamp
+
+    def to_string(self):
+        return "%s (%d, %d) at %.3f" % ("lift" if self.kind == LIFT else "place",
+                self.row, self.col, self.timestamp)
+
+"""
+scans the grid over and over, turning the changes into lift and place
+events. a square only changes once it has read the same new value for
+debounce scans in a row, so a piece sliding over a sensor or a bouncing
+contact does not make events.
+mask - the squares to watch (see square_bit), the whole grid if not given
+"""
+class Scanner:
+
+    def __init__(self, detection, debounce=3, mask=ALL_SQUARES_MASK):
+        self._detection = detection
+        self._debounce = debounce
+        self._mask = mask
+        #the last settled reading of each square
+        self._stable = [list(row) for row in detection.update_board()]
+        #the squares reading differently to their settled value, mapped to
+        #the number of scans in a row they have done so and the time of the first
+        self._pending = {}
+
+    """
+    watch only the squares in the mask, so that they are scanned more often
+    """
+    def set_mask(self, mask):
+        self._mask = mask
+
+    """
+    a copy of the settled grid
+    """
+    def stable_board(self):
+        return [list(row) for row in self._stable]
+
+    """
+    scan the grid once, returning the events for the squares which have now
+    settled on a new value
+    """
+    def scan(self):
+        grid = self._detection.update_board(self._mask)
+        now = time.monotonic()
+        events = []
+        pending_rows = set(row for row, col in self._pending)
+        for row in range(NUM_DETECTION_ROWS):
+            #most rows are unchanged, which is seen without looking at each square
+            if grid[row] == self._stable[row] and row not in pending_rows:
+                continue
+            for col in range(NUM_DETECTION_COLS):
+                value = grid[row][col]
+                if value == self._stable[row][col]:
+                    self._pending.pop((row, col), None)
+                    continue
+                count, first_seen = self._pending.get((row, col), (0, now))
+                count += 1
+                if count < self._debounce:
+                    self._pending[(row, col)] = (count, first_seen)
+                else:
+                    del self._pending[(row, col)]
+                    self._stable[row][col] = value
+                    events += [SquareEvent(PLACE if value == OCCUPIED else LIFT, row, col, first_seen)]
+        return events
+
+    """
+    a generator of events, scanning until the caller stops taking them
+    interval - the seconds to wait between scans
+    """
+    def events(self, interval=0):
+        while True:
+            for event in self.scan():
+                yield event
+            if interval > 0:
+                time.sleep(interval)
+
+    """
+    scan in the background under asyncio, putting each event on the queue
+    until cancelled
+    interval - the seconds to give to other tasks between scans
+    """
+    async def run(self, queue, interval=0.001):
+        while True:
+            for event in self.scan():
+                queue.put_nowait(event)
+            await asyncio.sleep(interval)
 
 if __name__ == "__main__":
-    det = Detection()
-    det.print_board()
-    while(1):
-        time.sleep(5)
+    import sys
+    #the backend can be given by name, e.g. python detection.py pigpio
+    det = Detection(BACKENDS[sys.argv[1]]() if len(sys.argv) > 1 else None)
+    #measure how fast the board can be scanned
+    for i in range(100):
         det.update_board()
-        det.print_board()
-  
+    print("%.0f scans per second" % det.scans_per_second())
+    det.print_board()
+    #then show the pieces being moved as they happen
+    for event in Scanner(det).events():
+        print(event.to_string())
@@ -0,0 +1,371 @@
+import asyncio
+import contextlib
+import queue
+import subprocess
+
+"""
+running UCI chess engines (stockfish) as separate processes.
+an Engine is one process, and an EnginePool keeps a number of them running
+to be lent out game after game, so that the engines are only started once
+and are always shut down at the end. an AsyncEngine is an engine process
+for use with asyncio, which can be waited on alongside other work.
+"""
+
+#how long an engine is given to quit before it is killed, in seconds
+QUIT_TIMEOUT = 5
+
+"""
+a single engine process, talked to over its standard input and output
+"""
+class Engine:
+
+    """
+    constructor, starts the engine and waits until it is ready
+    path - the engine program to run
+    """
+    def __init__(self, path="stockfish"):
+        self._process = subprocess.Popen(
+                path,
+                universal_newlines = True,
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE,
+                bufsize=1,
+        )
+        #whether a search has been started and its best move not yet read
+        self._searching = False
+        #ensure that the engine is working in uci
+        self.send("uci")
+        self.wait_for("uciok")
+        self.ready()
+
+    """
+    send a command to the engine
+    """
+    def send(self, command):
+        self._process.stdin.write(command + "\n")
+
+    """
+    read the next line from the engine, split into its words
+    """
+    def read(self):
+        line = self._process.stdout.readline()
+        if line == "":
+            raise Exception("the engine has stopped")
+        return line.strip().split()
+
+    """
+    read lines from the engine until one starting with the given word,
+    which is returned split into its words
+    """
+    def wait_for(self, word):
+        response = [""]
+        while len(response) == 0 or response[0] != word:
+            response = self.read()
+        return response
+
+    """
+    wait until the engine has finished with every command sent to it
+    """
+    def ready(self):
+        self.send("isready")
+        self.wait_for("readyok")
+
+    """
+    start a search with the arguments of the UCI go command
+    """
+    def go(self, arguments):
+        self.send("go %s" % arguments)
+        self._searching = True
+
+    """
+    wait for the search to finish, and return its bestmove line split into
+    words, the move then optionally "ponder" and the expected reply
+    """
+    def best_move(self):
+        response = self.wait_for("bestmove")
+        self._searching = False
+        return response
+
+    """
+    end the search if there is one running, throwing away its result
+    """
+    def stop(self):
+        if self._searching:
+            self.send("stop")
+            self.best_move()
+
+    def set_option(self, name, value):
+        self.send("setoption name %s value %s" % (name, value))
+
+    """
+    tell the engine that the next position is from a different game
+    """
+    def new_game(self):
+        self.stop()
+        self.send("ucinewgame")
+        self.ready()
+
+    """
+    quit the engine, killing it if it does not quit in time
+    """
+    def close(self):
+        if self._process.poll() != None:
+            return
+        try:
+            self.send("quit")
+            self._process.stdin.close()
+        except OSError:
+            pass
+        try:
+            self._process.wait(QUIT_TIMEOUT)
+        except subprocess.TimeoutExpired:
+            self._process.kill()
+            self._process.wait()
+
+"""
+a fixed number of engines, started once and lent out to play games
+size - the number of engines, the most that can be lent out at once
+path - the engine program to run
+"""
+class EnginePool:
+
+    def __init__(self, size=2, path="stockfish"):
+        self._engines = []
+        self._idle = queue.Queue()
+        try:
+            for i in range(size):
+                self._engines += [Engine(path)]
+                self._idle.put(self._engines[-1])
+        except:
+            #do not leave the engines that did start running
+            self.close()
+            raise
+
+    """
+    borrow an engine for a game, set to the given skill level (0 to 20).
+    the engine is set up for a new game, and waits for one to be returned
+    if they are all lent out. used as a context manager, which returns the
+    engine to the pool at the end
+    """
+    @contextlib.contextmanager
+    def lease(self, rating=20):
+        engine = self._idle.get()
+        try:
+            engine.set_option("Skill Level", rating)
+            engine.new_game()
+            yield engine
+        finally:
+            self._idle.put(engine)
+
+    """
+    shut down every engine
+    """
+    def close(self):
+        for engine in self._engines:
+            engine.close()
+        self._engines = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+#the info fields which have a single whole number value
+INFO_NUMBERS = ["depth", "seldepth", "time", "nodes", "multipv", "currmovenumber",
+        "hashfull", "nps", "tbhits", "cpuload", "sbhits"]
+
+#how long to wait for the engine to answer a command, in seconds
+ENGINE_TIMEOUT = 10
+
+"""
+turn the words of an info line from an engine (after "info") into a
+dictionary. the score is a (kind, value) pair, kind being "cp" for
+centipawns or "mate" for moves until mate, and the pv is a list of moves
+"""
+def parse_info(words):
+    info = {}
+    i = 0
+    while i < len(words):
+        word = words[i]
+        if word in INFO_NUMBERS and i + 1 < len(words):
+            info[word] = int(words[i + 1])
+            i += 2
+        elif word == "score" and i + 2 < len(words):
+            info["score"] = (words[i + 1], int(words[i + 2]))
+            i += 3
+            #the score may only be a bound while the search is unsure
+            if i < len(words) and words[i] in ["lowerbound", "upperbound"]:
+                info["bound"] = words[i]
+                i += 1
+        elif word == "currmove" and i + 1 < len(words):
+            info["currmove"] = words[i + 1]
+            i += 2
+        elif word == "pv":
+            #the pv runs to the end of the line
+            info["pv"] = words[i + 1:]
+            break
+        elif word == "string":
+            info["string"] = " ".join(words[i + 1:])
+            break
+        else:
+            i += 1
+    return info
+
+"""
+an engine process driven with asyncio, so that waiting for the engine does
+not stop other work (like scanning the board) from being done.
+a task reads everything the engine says, and the commands waiting on an
+answer are woken up when it arrives. every wait has a timeout, so a hung
+engine raises asyncio.TimeoutError rather than freezing the game.
+create one with AsyncEngine.start
+"""
+class AsyncEngine:
+
+    def __init__(self, process):
+        self._process = process
+        #futures waiting for a reply, by the first word of the reply
+        self._waiting = {}
+        #the future for the bestmove of the running search, None if there is no search
+        self._search = None
+        self._on_info = None
+        #the last info line of the current or last search
+        self.info = {}
+        self._reader = asyncio.ensure_future(self._read_lines())
+
+    """
+    start an engine and wait until it is ready
+    path - the engine program to run
+    """
+    @classmethod
+    async def start(cls, path="stockfish", timeout=ENGINE_TIMEOUT):
+        process = await asyncio.create_subprocess_exec(path,
+                stdin=asyncio.subprocess.PIPE, stdout=asyncio.subprocess.PIPE)
+        engine = cls(process)
+        try:
+            uciok = engine._expect("uciok")
+            engine.send("uci")
+            await asyncio.wait_for(uciok, timeout)
+            await engine.isready(timeout)
+        except:
+            await engine.close()
+            raise
+        return engine
+
+    def send(self, command):
+        self._process.stdin.write((command + "\n").encode())
+
+    """
+    a future for the next line from the engine starting with the given word
+    """
+    def _expect(self, word):
+        future = asyncio.get_running_loop().create_future()
+        self._waiting.setdefault(word, []).append(future)
+        return future
+
+    """
+    read what the engine says until it stops, passing each line on to
+    whatever is waiting for it
+    """
+    async def _read_lines(self):
+        while True:
+            line = await self._process.stdout.readline()
+            if line == b"":
+                break
+            words = line.decode().split()
+            if len(words) == 0:
+                continue
+            if words[0] == "info":
+                self.info = parse_info(words[1:])
+                if self._on_info != None:
+                    self._on_info(self.info)
+            elif words[0] == "bestmove":
+                if self._search != None and not self._search.done():
+                    self._search.set_result(words[1:])
+                self._search = None
+            else:
+                for future in self._waiting.pop(words[0], []):
+                    if not future.done():
+                        future.set_result(words)
+        #the engine has stopped, so nothing waiting will get an answer
+        futures = sum(self._waiting.values(), [])
+        if self._search != None:
+            futures += [self._search]
+        for future in futures:
+            if not future.done():
+                future.set_exception(Exception("the engine has stopped"))
+        self._waiting = {}
+
+    """
+    wait until the engine has finished with every command sent to it
+    """
+    async def isready(self, timeout=ENGINE_TIMEOUT):
+        readyok = self._expect("readyok")
+        self.send("isready")
+        await asyncio.wait_for(readyok, timeout)
+
+    def set_option(self, name, value):
+        self.send("setoption name %s value %s" % (name, value))
+
+    """
+    tell the engine that the next position is from a different game
+    """
+    async def new_game(self, timeout=ENGINE_TIMEOUT):
+        await self.stop(timeout)
+        self.send("ucinewgame")
+        await self.isready(timeout)
+
+    """
+    search the position last sent, with the arguments of the UCI go command,
+    and wait for the result.
+    returns the best move and the reply the engine expects (None if it did
+    not say), both as UCI strings
+    timeout - the most seconds to wait, after which the search is stopped
+              and asyncio.TimeoutError raised. None to wait for as long as
+              the search takes
+    on_info - called with the dictionary of each info line as it arrives
+    """
+    async def go(self, arguments, timeout=None, on_info=None):
+        if self._search != None:
+            raise Exception("the engine is already searching")
+        self._search = asyncio.get_running_loop().create_future()
+        search = self._search
+        self._on_info = on_info
+        self.info = {}
+        self.send("go %s" % arguments)
+        try:
+            #shielded so that a timeout does not cancel the result that stop waits for
+            response = await asyncio.wait_for(asyncio.shield(search), timeout)
+        except asyncio.TimeoutError:
+            await self.stop()
+            raise
+        finally:
+            self._on_info = None
+        ponder = response[2] if len(response) >= 3 and response[1] == "ponder" else None
+        return response[0], ponder
+
+    """
+    end the search if there is one running, and wait for it to finish
+    """
+    async def stop(self, timeout=ENGINE_TIMEOUT):
+        if self._search != None:
+            search = self._search
+            self.send("stop")
+            await asyncio.wait_for(asyncio.shield(search), timeout)
+
+    """
+    quit the engine, killing it if it does not quit in time
+    """
+    async def close(self):
+        if self._process.returncode == None:
+            try:
+                self.send("quit")
+                self._process.stdin.close()
+            except OSError:
+                pass
+            try:
+                await asyncio.wait_for(self._process.wait(), QUIT_TIMEOUT)
+            except asyncio.TimeoutError:
+                self._process.kill()
+                await self._process.wait()
+        await self._reader
@@ -0,0 +1,136 @@
+from constants import *
+
+"""
+tables for scoring a position by the material and the squares the pieces
+stand on. every piece has a value and a table of bonuses for each square,
+one set for the middlegame and one for the endgame, and the two scores are
+blended by how much material is left (the game phase).
+
+the board keeps the sums of these up to date as moves are made, so a
+position is scored without looking at its pieces.
+"""
+
+#the value of each piece in centipawns, in the middlegame and endgame
+MIDGAME_VALUES = {"p": 82, "n": 337, "b": 365, "r": 477, "q": 1025, "k": 0}
+ENDGAME_VALUES = {"p": 94, "n": 281, "b": 297, "r": 512, "q": 936, "k": 0}
+
+#how much each piece counts towards the game phase, which is MAX_PHASE
+#with all the pieces on the board and 0 with only kings and pawns
+PHASE_WEIGHTS = {"p": 0, "n": 1, "b": 1, "r": 2, "q": 4, "k": 0}
+MAX_PHASE = 24
+
+#the square bonuses for white, laid out as the board is seen from white's
+#side (the eighth row first). black uses them mirrored
+_PAWN = [
+      0,   0,   0,   0,   0,   0,   0,   0,
+     50,  50,  50,  50,  50,  50,  50,  50,
+     10,  10,  20,  30,  30,  20,  10,  10,
+      5,   5,  10,  25,  25,  10,   5,   5,
+      0,   0,   0,  20,  20,   0,   0,   0,
+      5,  -5, -10,   0,   0, -10,  -5,   5,
+      5,  10,  10, -20, -20,  10,  10,   5,
+      0,   0,   0,   0,   0,   0,   0,   0,
+]
+_PAWN_ENDGAME = [
+      0,   0,   0,   0,   0,   0,   0,   0,
+     80,  80,  80,  80,  80,  80,  80,  80,
+     50,  50,  50,  50,  50,  50,  50,  50,
+     30,  30,  30,  30,  30,  30,  30,  30,
+     20,  20,  20,  20,  20,  20,  20,  20,
+     10,  10,  10,  10,  10,  10,  10,  10,
+      0,   0,   0,   0,   0,   0,   0,   0,
+      0,   0,   0,   0,   0,   0,   0,   0,
+]
+_KNIGHT = [
+    -50, -40, -30, -30, -30, -30, -40, -50,
+    -40, -20,   0,   0,   0,   0, -20, -40,
+    -30,   0,  10,  15,  15,  10,   0, -30,
+    -30,   5,  15,  20,  20,  15,   5, -30,
+    -30,   0,  15,  20,  20,  15,   0, -30,
+    -30,   5,  10,  15,  15,  10,   5, -30,
+    -40, -20,   0,   5,   5,   0, -20, -40,
+    -50, -40, -30, -30, -30, -30, -40, -50,
+]
+_BISHOP = [
+    -20, -10, -10, -10, -10, -10, -10, -20,
+    -10,   0,   0,   0,   0,   0,   0, -10,
+    -10,   0,   5,  10,  10,   5,   0, -10,
+    -10,   5,   5,  10,  10,   5,   5, -10,
+    -10,   0,  10,  10,  10,  10,   0, -10,
+    -10,  10,  10,  10,  10,  10,  10, -10,
+    -10,   5,   0,   0,   0,   0,   5, -10,
+    -20, -10, -10, -10, -10, -10, -10, -20,
+]
+_ROOK = [
+      0,   0,   0,   0,   0,   0,   0,   0,
+      5,  10,  10,  10,  10,  10,  10,   5,
+     -5,   0,   0,   0,   0,   0,   0,  -5,
+     -5,   0,   0,   0,   0,   0,   0,  -5,
+     -5,   0,   0,   0,   0,   0,   0,  -5,
+     -5,   0,   0,   0,   0,   0,   0,  -5,
+     -5,   0,   0,   0,   0,   0,   0,  -5,
+      0,   0,   0,   5,   5,   0,   0,   0,
+]
+_QUEEN = [
+    -20, -10, -10,  -5,  -5, -10, -10, -20,
+    -10,   0,   0,   0,   0,   0,   0, -10,
+    -10,   0,   5,   5,   5,   5,   0, -10,
+     -5,   0,   5,   5,   5,   5,   0,  -5,
+      0,   0,   5,   5,   5,   5,   0,  -5,
+    -10,   5,   5,   5,   5,   5,   0, -10,
+    -10,   0,   5,   0,   0,   0,   0, -10,
+    -20, -10, -10,  -5,  -5, -10, -10, -20,
+]
+_KING = [
+    -30, -40, -40, -50, -50, -40, -40, -30,
+    -30, -40, -40, -50, -50, -40, -40, -30,
+    -30, -40, -40, -50, -50, -40, -40, -30,
+    -30, -40, -40, -50, -50, -40, -40, -30,
+    -20, -30, -30, -40, -40, -30, -30, -20,
+    -10, -20, -20, -20, -20, -20, -20, -10,
+     20,  20,   0,   0,   0,   0,  20,  20,
+     20,  30,  10,   0,   0,  10,  30,  20,
+]
+_KING_ENDGAME = [
+    -50, -40, -30, -20, -20, -30, -40, -50,
+    -30, -20, -10,   0,   0, -10, -20, -30,
+    -30, -10,  20,  30,  30,  20, -10, -30,
+    -30, -10,  30,  40,  40,  30, -10, -30,
+    -30, -10,  30,  40,  40,  30, -10, -30,
+    -30, -10,  20,  30,  30,  20, -10, -30,
+    -30, -30,   0,   0,   0,   0, -30, -30,
+    -50, -30, -30, -30, -30, -30, -30, -50,
+]
+
+_MIDGAME_BONUSES = {"p": _PAWN, "n": _KNIGHT, "b": _BISHOP, "r": _ROOK, "q": _QUEEN, "k": _KING}
+_ENDGAME_BONUSES = {"p": _PAWN_ENDGAME, "n": _KNIGHT, "b": _BISHOP, "r": _ROOK, "q": _QUEEN, "k": _KING_ENDGAME}
+
+"""
+the score of each piece letter on each square (row * 8 + col) for a colour,
+value and bonus together, positive for white and negative for black
+"""
+def _piece_square_tables(values, bonuses):
+    tables = []
+    for colour in range(NUM_COLOURS):
+        sign = 1 if colour == WHITE else -1
+        tables += [{}]
+        for letter in values:
+            scores = []
+            for row in range(NUM_ROWS):
+                for col in range(NUM_COLS):
+                    #the tables are drawn with white's eighth row first
+                    drawn_row = NUM_ROWS - 1 - row if colour == WHITE else row
+                    scores += [sign * (values[letter] + bonuses[letter][drawn_row * NUM_COLS + col])]
+            tables[colour][letter] = scores
+    return tables
+
+MIDGAME_TABLES = _piece_square_tables(MIDGAME_VALUES, _MIDGAME_BONUSES)
+ENDGAME_TABLES = _piece_square_tables(ENDGAME_VALUES, _ENDGAME_BONUSES)
+
+"""
+blend a middlegame and endgame score by the game phase, a phase above
+MAX_PHASE (from extra promoted pieces) counts as the middlegame
+"""
+def tapered(midgame, endgame, phase):
+    phase = min(phase, MAX_PHASE)
+    return (midgame * phase + endgame * (MAX_PHASE - phase)) // MAX_PHASE
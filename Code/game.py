@@ -1,4 +1,5 @@
 from chessboard import Board
+from player import Player
 from constants import *
 
 class Game:
@@ -7,11 +8,13 @@ class Game:
     """
     constructor
     player1 and player2 are both Player objects, defining how moves will be made for each of them
+    (or AsyncPlayer objects, for games played with play_game_async)
     display determines how to display the board
+    board - the board to play on, a fresh Board if not given
     """
-    def __init__(self, playerW, playerB, display=True):
-        self._b = Board()
-        self._turn = WHITE
+    def __init__(self, playerW, playerB, display=True, board=None):
+        self._b = board if board != None else Board()
+        self._turn = self._b.turn()
         self._players = [playerW, playerB] #just so we can index to each player
         self._display = display
 
@@ -19,42 +22,66 @@ class Game:
     play a game of chess with the given players and display mechanism
     """
     def play_game(self):
+        #players that can only move under asyncio are turned away before the game starts
+        for player in self._players:
+            if not isinstance(player, Player):
+                raise ValueError("%s can only play with Game.play_game_async" % type(player).__name__)
         #continuous loop until an end condition is reached
         while(True):
-            #show the display to the terminal if it is wanted
-            if self._display:
-                self._b.print_board()
-
-            active_player = self._players[self._turn]
-
-            #check for any game endings
-            game_ending = self._b.game_end(self._turn)
-            if game_ending == CHECKMATE:
-                print("Checkmate! %s wins!" % ("White" if self._turn == BLACK else "Black"))
-                return CHECKMATE
-            elif game_ending == STALEMATE:
-                print("Stalemate!")
-                return STALEMATE
-            elif game_ending == INSUFFICIENT_MATERIAL:
-                print("Draw by insufficient material")
-                return INSUFFICIENT_MATERIAL
-            elif game_ending == FIFTY_MOVE_RULE:
-                print("Draw by fifty move rule")
-                return FIFTY_MOVE_RULE
-            elif game_ending == REPETITION:
-                print("Draw by repetition")
-                return REPETITION
-            
+            game_ending = self._start_turn()
+            if game_ending != NO_ENDING:
+                return game_ending
             #the game is not over, get the player to select a move
             legal_moves = self._b.all_legal_moves_dict(self._turn)
-            selected_move = active_player.make_move(self._b, legal_moves)
+            selected_move = self._players[self._turn].make_move(self._b, legal_moves)
+            self._finish_turn(selected_move)
 
-            #then update the board with the move made
-            self._b.execute_move(selected_move)
+    """
+    play_game for use with asyncio, the players' moves are waited on so that
+    other tasks (such as scanning the board) run while a player thinks
+    """
+    async def play_game_async(self):
+        while(True):
+            game_ending = self._start_turn()
+            if game_ending != NO_ENDING:
+                return game_ending
+            legal_moves = self._b.all_legal_moves_dict(self._turn)
+            selected_move = await self._players[self._turn].make_move_async(self._b, legal_moves)
+            self._finish_turn(selected_move)
+
+    """
+    show the board and check for the end of the game before a move
+    returns the ending if the game is over, NO_ENDING otherwise
+    """
+    def _start_turn(self):
+        #show the display to the terminal if it is wanted
+        if self._display:
+            self._b.print_board()
+
+        #check for any game endings
+        game_ending = self._b.game_end(self._turn)
+        if game_ending == CHECKMATE:
+            print("Checkmate! %s wins!" % ("White" if self._turn == BLACK else "Black"))
+        elif game_ending == STALEMATE:
+            print("Stalemate!")
+        elif game_ending == INSUFFICIENT_MATERIAL:
+            print("Draw by insufficient material")
+        elif game_ending == FIFTY_MOVE_RULE:
+            print("Draw by fifty move rule")
+        elif game_ending == REPETITION:
+            print("Draw by repetition")
+        return game_ending
+
+    """
+    play the selected move and pass the turn over
+    """
+    def _finish_turn(self, selected_move):
+        #then update the board with the move made
+        self._b.execute_move(selected_move)
 
-            #say whether we are in check or not
-            if self._b.is_check(self._turn):
-                print("Check!")
+        #say whether we are in check or not
+        if self._b.is_check(self._turn):
+            print("Check!")
 
-            #switch player
-            self._turn = 1 - self._turn
+        #switch player
+        self._turn = 1 - self._turn
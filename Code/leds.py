@@ -0,0 +1,185 @@
+from abc import ABC, abstractmethod
+import importlib
+import os
+import sys
+import time
+from detection import NUM_DETECTION_ROWS, NUM_DETECTION_COLS
+
+"""
+driving the LEDs under the detection grid, one LED per square on a single
+strip. the colours are drawn into a frame buffer and the whole strip is
+written at once by show, rather than refreshing the strip for every pixel
+changed.
+"""
+
+#the pin the strip is driven from
+LED_CONTROL = 18
+
+#the number of LEDs on the strip
+NUM_LEDS = NUM_DETECTION_ROWS * NUM_DETECTION_COLS
+
+OFF = (0, 0, 0)
+
+"""
+the index on the strip of the LED under a square of the grid. the strip runs
+along the first row, then back along the second and so on, so every other
+row is reversed if serpentine
+"""
+def strip_index(row, col, serpentine=True):
+    if serpentine and row % 2 == 1:
+        col = NUM_DETECTION_COLS - 1 - col
+    return row * NUM_DETECTION_COLS + col
+
+"""
+import a library module, skipping this directory, which has scripts called
+board.py and neopixel.py that would be imported in place of the libraries
+"""
+def _import_library(name):
+    here = os.path.dirname(os.path.abspath(__file__))
+    path = sys.path
+    sys.path = [entry for entry in path if os.path.abspath(entry or ".") != here]
+    try:
+        return importlib.import_module(name)
+    finally:
+        sys.path = path
+
+"""
+a way of writing colours to the strip
+"""
+class LedBackend(ABC):
+
+    """
+    write the colours to the strip, one (r, g, b) tuple for each LED in
+    strip order
+    """
+    @abstractmethod
+    def show(self, pixels):
+        pass
+
+    def close(self):
+        pass
+
+"""
+a backend for a strip of NeoPixels, through the Adafruit library. the
+strip is only refreshed when show is called
+"""
+class NeoPixelBackend(LedBackend):
+
+    def __init__(self, num_leds=NUM_LEDS, brightness=1.0):
+        board = _import_library("board")
+        neopixel = _import_library("neopixel")
+        self._pixels = neopixel.NeoPixel(getattr(board, "D%d" % LED_CONTROL), num_leds,
+                brightness=brightness, auto_write=False)
+
+    def show(self, pixels):
+        self._pixels[:] = pixels
+        self._pixels.show()
+
+    def close(self):
+        self._pixels.deinit()
+
+"""
+a stand in for the strip, for testing without hardware. it keeps the last
+frame shown, and can take as long as a real strip would to be written
+led_time - the seconds to write each LED, a NeoPixel takes 30 microseconds
+"""
+class SoftwareBackend(LedBackend):
+
+    def __init__(self, num_leds=NUM_LEDS, led_time=0):
+        self.pixels = [OFF] * num_leds
+        self.shows = 0
+        self._led_time = led_time
+
+    def show(self, pixels):
+        self.pixels = list(pixels)
+        self.shows += 1
+        if self._led_time > 0:
+            time.sleep(self._led_time * len(pixels))
+
+"""
+the LEDs as a grid the same shape as the detection grid, with a frame
+buffer which is drawn into and then shown
+backend - the LedBackend to show the frames with, a NeoPixel strip if not given
+serpentine - whether every other row of the strip runs backwards
+"""
+class LedDisplay:
+
+    def __init__(self, backend=None, serpentine=True):
+        self._backend = backend if backend != None else NeoPixelBackend()
+        self._frame = [[OFF] * NUM_DETECTION_COLS for row in range(NUM_DETECTION_ROWS)]
+        #the index on the strip of each square, worked out once
+        self._indices = [[strip_index(row, col, serpentine) for col in range(NUM_DETECTION_COLS)]
+                for row in range(NUM_DETECTION_ROWS)]
+        #the last frame written to the strip, in strip order
+        self._shown = None
+        #the number of frames written and the time spent writing them
+        self._frames = 0
+        self._show_time = 0
+
+    def set_pixel(self, row, col, colour):
+        self._frame[row][col] = colour
+
+    def get_pixel(self, row, col):
+        return self._frame[row][col]
+
+    """
+    set every square to the colour
+    """
+    def fill(self, colour):
+        for row in self._frame:
+            for col in range(NUM_DETECTION_COLS):
+                row[col] = colour
+
+    def clear(self):
+        self.fill(OFF)
+
+    """
+    write the frame to the strip, if it is different to the last one shown.
+    returns whether the strip was written
+    """
+    def show(self):
+        pixels = [OFF] * NUM_LEDS
+        for row in range(NUM_DETECTION_ROWS):
+            frame_row = self._frame[row]
+            indices = self._indices[row]
+            for col in range(NUM_DETECTION_COLS):
+                pixels[indices[col]] = frame_row[col]
+        if pixels == self._shown:
+            return False
+        start = time.perf_counter()
+        self._backend.show(pixels)
+        self._show_time += time.perf_counter() - start
+        self._frames += 1
+        self._shown = pixels
+        return True
+
+    """
+    the rate the strip has been written at, in frames per second of time
+    spent writing
+    """
+    def frames_per_second(self):
+        if self._show_time <= 0:
+            return 0
+        return self._frames / self._show_time
+
+    """
+    turn the LEDs off and release the strip
+    """
+    def close(self):
+        self.clear()
+        self.show()
+        self._backend.close()
+
+if __name__ == "__main__":
+    #light up the occupied squares, using the stand ins if there is no hardware
+    import detection
+    hardware = len(sys.argv) > 1 and sys.argv[1] == "hardware"
+    det = detection.Detection(None if hardware else detection.FakeBackend())
+    display = LedDisplay(None if hardware else SoftwareBackend(led_time=0.00003))
+    for i in range(1000):
+        grid = det.update_board()
+        for row in range(NUM_DETECTION_ROWS):
+            for col in range(NUM_DETECTION_COLS):
+                display.set_pixel(row, col, (255, 0, 0) if grid[row][col] == detection.OCCUPIED else (0, 0, 255))
+        display.show()
+    print("%.0f frames per second" % display.frames_per_second())
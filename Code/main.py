@@ -1,8 +1,13 @@
 from game import Game
+from bitboard import BitBoard
+from engine import EnginePool
 from player import ConsolePlayer, StockfishPlayer
 from constants import *
 
 if __name__ == "__main__":
-    while(1):
-        g = Game(StockfishPlayer(WHITE, rating=4), StockfishPlayer(BLACK))
-        g.play_game()
+    #the engines are started once and reused for every game
+    with EnginePool(2) as pool:
+        while(1):
+            with pool.lease(rating=4) as white, pool.lease() as black:
+                g = Game(StockfishPlayer(WHITE, engine=white), StockfishPlayer(BLACK, engine=black), board=BitBoard())
+                g.play_game()
@@ -6,8 +6,23 @@ Class defining a move, takes a piece to an end location
 def pos_to_square(row, col):
     return chr(ord('a') + col) + str(row+1)
 
+#the name of every square, looked up rather than built for every move
+SQUARE_NAMES = [[pos_to_square(row, col) for col in range(NUM_COLS)] for row in range(NUM_ROWS)]
+
+#the promotion choices in the order of their codes in an encoded move, 0 is no promotion
+PROMOTIONS = [None, "n", "b", "r", "q"]
+
+#flags in an encoded move
+EN_PASSANT_FLAG = 1
+CASTLE_FLAG = 2
+
 class Move:
 
+    #moves are made by the thousand during move generation, so they only
+    #get space for these attributes and no instance dictionary
+    __slots__ = ["piece", "start_row", "start_col", "end_row", "end_col",
+            "kill", "en_passant", "castle", "promotion"]
+
     """
     constructor.
     piece -  the piece being moved
@@ -18,7 +33,7 @@ class Move:
     castle - the ID of the castle if the move is a castle, NO_CASTLE otherwsie
     promotion - the choice of promotion from "q", "n", "r", "b" if the move is a promotion, None otherwise
     """
-    def __init__(self, piece, start_row, start_col, end_row, end_col, 
+    def __init__(self, piece, start_row, start_col, end_row, end_col,
             kill=None, en_passant=False, castle=NO_CASTLE, promotion=None):
         self.piece = piece
         self.start_row = start_row
@@ -34,30 +49,39 @@ class Move:
     the move as a string
     """
     def short_representation(self):
-        string = pos_to_square(self.start_row, self.start_col) + \
-                pos_to_square(self.end_row, self.end_col)
+        string = SQUARE_NAMES[self.start_row][self.start_col] + SQUARE_NAMES[self.end_row][self.end_col]
         #then if there is a promotion, dictate which promotion it is
         if self.promotion != None:
             string += self.promotion
         return string
 
     """
-    create a duplicate move instance
+    the move packed into a small integer, without any references to pieces.
+    bits 0-5 are the start square and 6-11 the end square (row * 8 + col),
+    12-14 the promotion (an index into PROMOTIONS) and 15-16 the flags.
+    Board.decode_move turns it back into a move on a board
     """
-    def duplicate(self):
-        return Move(self.piece, self.start_row, self.start_col, self.end_row, self.end_col,
-                self.kill, self.en_passant, self.castle, self.promotion)
+    def encode(self):
+        code = (self.start_row * NUM_COLS + self.start_col) | \
+                ((self.end_row * NUM_COLS + self.end_col) << 6)
+        if self.promotion != None:
+            code |= PROMOTIONS.index(self.promotion) << 12
+        if self.en_passant:
+            code |= EN_PASSANT_FLAG << 15
+        elif self.castle != NO_CASTLE:
+            code |= CASTLE_FLAG << 15
+        return code
 
     """
     full move information as a string
     """
     def to_string(self):
-        ret = "%s at %s " % (self.piece.get_name(), pos_to_square(self.start_row, self.start_col))
+        ret = "%s at %s " % (self.piece.get_name(), SQUARE_NAMES[self.start_row][self.start_col])
         if self.kill == None:
             ret += "moves to "
         else:
             ret += "kills %s at " % self.kill.get_name()
-        ret += pos_to_square(self.end_row, self.end_col)
+        ret += SQUARE_NAMES[self.end_row][self.end_col]
         if self.promotion != None:
             ret += " promoting to %s " % self.promotion
         elif self.castle != NO_CASTLE:
@@ -0,0 +1,179 @@
+import argparse
+import sys
+import time
+from chessboard import Board
+from bitboard import BitBoard
+
+"""
+perft (performance test) counts every position reachable from a starting
+position to a fixed depth. the counts are known for standard positions, so
+it checks the correctness of the move generation, and the time taken
+measures its speed.
+
+run from the Code directory:
+    python -m perft                               run the standard positions
+    python -m perft --fen "<fen>" --depth 4       count a single position
+    python -m perft --fen "<fen>" --depth 4 --divide
+"""
+
+#the boards that can be tested
+BOARDS = {"board": Board, "bitboard": BitBoard}
+
+#standard positions with their known node counts at depth 1, 2, 3...
+SUITE = [
+    ("start position", "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1",
+            [20, 400, 8902, 197281, 4865609]),
+    ("kiwipete", "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1",
+            [48, 2039, 97862, 4085603]),
+    ("position 3", "8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1",
+            [14, 191, 2812, 43238, 674624]),
+    ("position 4", "r3k2r/Pppp1ppp/1b3nbN/nP6/BBP1P3/q4N2/Pp1P2PP/R2Q1RK1 w kq - 0 1",
+            [6, 264, 9467, 422333]),
+    ("position 5", "rnbq1k1r/pp1Pbppp/2p5/8/2B5/8/PPP1NnPP/RNBQK2R w KQ - 1 8",
+            [44, 1486, 62379, 2103487]),
+    ("position 6", "r4rk1/1pp1qppp/p1np1n2/2b1p1B1/2B1P1b1/P1NP1N2/1PP1QPPP/R4RK1 w - - 0 10",
+            [46, 2079, 89890, 3894594]),
+    ("illegal en passant 1", "3k4/3p4/8/K1P4r/8/8/8/8 b - - 0 1",
+            [18, 92, 1670, 10138, 185429, 1134888]),
+    ("illegal en passant 2", "8/8/4k3/8/2p5/8/B2P2K1/8 w - - 0 1",
+            [13, 102, 1266, 10276, 135655, 1015133]),
+    ("en passant gives check", "8/8/1k6/2b5/2pP4/8/5K2/8 b - d3 0 1",
+            [15, 126, 1928, 13931, 206379, 1440467]),
+    ("short castle gives check", "5k2/8/8/8/8/8/8/4K2R w K - 0 1",
+            [15, 66, 1198, 6399, 120330, 661072]),
+    ("long castle gives check", "3k4/8/8/8/8/8/8/R3K3 w Q - 0 1",
+            [16, 71, 1286, 7418, 141077, 803711]),
+    ("castling rights", "r3k2r/1b4bq/8/8/8/8/7B/R3K2R w KQkq - 0 1",
+            [26, 1141, 27826, 1274206]),
+    ("castling prevented", "r3k2r/8/3Q4/8/8/5q2/8/R3K2R b KQkq - 0 1",
+            [44, 1494, 50509, 1720476]),
+    ("promote out of check", "2K2r2/4P3/8/8/8/8/8/3k4 w - - 0 1",
+            [11, 133, 1442, 19174, 266199, 3821001]),
+    ("discovered check", "8/8/1P2K3/8/2n5/1q6/8/5k2 b - - 0 1",
+            [29, 165, 5160, 31961, 1004658]),
+    ("promote to give check", "4k3/1P6/8/8/8/8/K7/8 w - - 0 1",
+            [9, 40, 472, 2661, 38983, 217342]),
+    ("underpromote to give check", "8/P1k5/K7/8/8/8/8/8 w - - 0 1",
+            [6, 27, 273, 1329, 18135, 92683]),
+    ("self stalemate", "K1k5/8/P7/8/8/8/8/8 w - - 0 1",
+            [2, 6, 13, 63, 382, 2217]),
+    ("stalemate and checkmate 1", "8/k1P5/8/1K6/8/8/8/8 w - - 0 1",
+            [10, 25, 268, 926, 10857, 43261, 567584]),
+    ("stalemate and checkmate 2", "8/8/2k5/5q2/5n2/8/5K2/8 b - - 0 1",
+            [37, 183, 6559, 23527]),
+]
+
+#positions that are not reachable in a game, which loading must reject
+REJECTED = [
+    ("en passant with no pawn", "4k3/8/8/8/3p4/8/8/4K3 b - e3 0 1"),
+    ("side not to move in check", "4k3/8/8/8/8/8/8/4R1K1 w - - 0 1"),
+]
+
+"""
+count the positions reachable from the board in exactly depth moves,
+with the given colour to move
+"""
+def perft(board, colour, depth):
+    if depth == 0:
+        return 1
+    moves = board.all_legal_moves(colour)
+    #the last move never needs to be played, every legal move is a position
+    if depth == 1:
+        return len(moves)
+    nodes = 0
+    for move in moves:
+        board.execute_move(move)
+        nodes += perft(board, 1 - colour, depth - 1)
+        board.undo_move()
+    return nodes
+
+"""
+perft split up by the first move, returns a dictionary from the UCI
+representation of each move to the positions reachable after it
+"""
+def divide(board, colour, depth):
+    counts = {}
+    for move in board.all_legal_moves(colour):
+        board.execute_move(move)
+        counts[move.short_representation()] = perft(board, 1 - colour, depth - 1)
+        board.undo_move()
+    return counts
+
+"""
+time a perft of a position, returns the node count and the time taken
+"""
+def timed_perft(board, depth):
+    start = time.perf_counter()
+    nodes = perft(board, board.turn(), depth)
+    return nodes, time.perf_counter() - start
+
+"""
+nodes per second as a string, with a guard against immeasurably fast runs
+"""
+def nps_string(nodes, seconds):
+    if seconds <= 0:
+        return "-"
+    return "%d" % (nodes / seconds)
+
+"""
+run perft on every position in the suite, at the deepest known depth that
+has at most max_nodes positions (and is no deeper than max_depth).
+returns True if every count was correct
+"""
+def run_suite(board_class, max_nodes, max_depth=None):
+    passed = True
+    total_nodes = 0
+    total_time = 0
+    for name, fen, counts in SUITE:
+        depth = 1
+        while depth < len(counts) and counts[depth] <= max_nodes and \
+                (max_depth == None or depth < max_depth):
+            depth += 1
+        nodes, seconds = timed_perft(board_class.from_fen(fen), depth)
+        correct = nodes == counts[depth - 1]
+        passed = passed and correct
+        total_nodes += nodes
+        total_time += seconds
+        print("%-28s depth %d %10d nodes %7.2fs %9s nps  %s" % (name, depth, nodes, seconds,
+                nps_string(nodes, seconds), "ok" if correct else "FAILED (expected %d)" % counts[depth - 1]))
+    print("total %d nodes in %.2fs, %s nps" % (total_nodes, total_time, nps_string(total_nodes, total_time)))
+    for name, fen in REJECTED:
+        try:
+            board_class.from_fen(fen)
+            rejected = False
+        except ValueError:
+            rejected = True
+        passed = passed and rejected
+        print("%-28s %s" % (name, "rejected" if rejected else "FAILED (loaded)"))
+    return passed
+
+def main():
+    parser = argparse.ArgumentParser(description="count and time move generation")
+    parser.add_argument("--fen", help="the position to count, runs the standard suite if not given")
+    parser.add_argument("--depth", type=int, help="the depth to count to (a maximum for the suite)")
+    parser.add_argument("--divide", action="store_true", help="show the count after each first move")
+    parser.add_argument("--board", choices=sorted(BOARDS), default="bitboard", help="the board to test")
+    parser.add_argument("--max-nodes", type=int, default=200000,
+            help="the most nodes for a position in the suite")
+    args = parser.parse_args()
+    board_class = BOARDS[args.board]
+
+    if args.fen == None:
+        return 0 if run_suite(board_class, args.max_nodes, args.depth) else 1
+
+    board = board_class.from_fen(args.fen)
+    depth = args.depth if args.depth != None else 3
+    if args.divide:
+        start = time.perf_counter()
+        counts = divide(board, board.turn(), depth)
+        seconds = time.perf_counter() - start
+        for move in sorted(counts):
+            print("%s: %d" % (move, counts[move]))
+        nodes = sum(counts.values())
+    else:
+        nodes, seconds = timed_perft(board, depth)
+    print("depth %d: %d nodes in %.2fs, %s nps" % (depth, nodes, seconds, nps_string(nodes, seconds)))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -2,18 +2,48 @@ from abc import ABC, abstractmethod
 from constants import *
 from move import Move
 
+"""
+the squares reached from (row, col) by stepping (dr, dc) repeatedly,
+nearest first, up to the edge of the board (or just once if not repeated)
+"""
+def _squares_along(row, col, dr, dc, repeat=True):
+    squares = []
+    row += dr
+    col += dc
+    while 0 <= row < NUM_ROWS and 0 <= col < NUM_COLS:
+        squares += [(row, col)]
+        if not repeat:
+            break
+        row += dr
+        col += dc
+    return squares
+
+#tables of the squares each piece can reach from every square of an empty
+#board, built once at import so that move generation never leaves the board.
+#the ray tables hold a list of squares for each direction, and the rays
+#that run straight into the edge are left out
+STRAIGHT_RAYS = [[[ray for ray in [_squares_along(row, col, dr, dc) for dr, dc in STRAIGHT_DIRECTIONS] if ray]
+        for col in range(NUM_COLS)] for row in range(NUM_ROWS)]
+DIAGONAL_RAYS = [[[ray for ray in [_squares_along(row, col, dr, dc) for dr, dc in DIAGONAL_DIRECTIONS] if ray]
+        for col in range(NUM_COLS)] for row in range(NUM_ROWS)]
+KNIGHT_TARGETS = [[sum([_squares_along(row, col, dr, dc, False) for dr, dc in KNIGHT_JUMPS], [])
+        for col in range(NUM_COLS)] for row in range(NUM_ROWS)]
+KING_TARGETS = [[sum([_squares_along(row, col, dr, dc, False) for dr, dc in KING_STEPS], [])
+        for col in range(NUM_COLS)] for row in range(NUM_ROWS)]
+
 class Piece(ABC):
 
     """
     Constructor.
     piece should be "p" - pawn, "r" - rook, "n" - knight, 
                     "b" - bishop, "q" - queen or "k" - king
+    moves - the number of moves the piece has already made
     """
-    def __init__(self, colour, piece, index, row, col):
+    def __init__(self, colour, piece, index, row, col, moves=0):
         self._colour = colour
         self._index = index
         self._letter = piece
-        self._moves = 0
+        self._moves = moves
         self._alive = True
         self._row = row
         self._col = col
@@ -77,86 +107,68 @@ class Piece(ABC):
             return self._letter
 
     """
-    gets all moves along a given direction
-    dr is the change in row
-    dc is the change in col
+    gets all moves along the given rays, each a list of squares leading away
+    from the piece, stopping each ray at the first piece on it
     """
-    def _moves_along_direction(self, board, dr, dc):
-        #start from the current position
-        row = self._row
-        col = self._col
+    def _moves_along_rays(self, board, rays, captures=True, quiets=True):
+        squares = board.get_squares()
         possibles = []
-        while(True):
-            row += dr
-            col += dc
-            #get the colour of the piece at the square
-            colour = board.colour_at_square(row, col)
-            #check for if we cannot move to this square
-            if colour == self._colour or colour == OFF_BOARD:
-                break
-            elif colour == NO_COLOUR:
-                #if there is no piece there, we can move there
-                possibles += [Move(self, self._row, self._col, row, col, kill=None)]
-            else: #there is a piece of the opposite colour there
-                possibles += [Move(self, self._row, self._col, row, col, kill=board.piece_at_square(row, col))]
-                #we also cannot keep moving along this path
-                break
+        for ray in rays:
+            for row, col in ray:
+                piece = squares[row][col]
+                if piece == None:
+                    #if there is no piece there, we can move there
+                    if quiets:
+                        possibles += [Move(self, self._row, self._col, row, col, kill=None)]
+                else:
+                    #a piece of the opposite colour can be taken
+                    if captures and piece.get_colour() != self._colour:
+                        possibles += [Move(self, self._row, self._col, row, col, kill=piece)]
+                    #either way we cannot keep moving along this path
+                    break
         return possibles
 
     """
     gets all possible diagonal moves (shared by bishop and queen)
     """
-    def _diagonal_moves(self, board):
-        possibles = []
-        for dr, dc in [(1,1), (1,-1), (-1,1), (-1,-1)]:
-            possibles += self._moves_along_direction(board, dr, dc)
-        return possibles
+    def _diagonal_moves(self, board, captures=True, quiets=True):
+        return self._moves_along_rays(board, DIAGONAL_RAYS[self._row][self._col], captures, quiets)
 
     """
     gets all possible straight line moves (shared by rook and queen)
     """
-    def _straight_moves(self, board):
-        possibles = []
-        for dr, dc in [(0,1), (0,-1), (-1,0), (1, 0)]:
-            possibles += self._moves_along_direction(board, dr, dc)
-        return possibles
+    def _straight_moves(self, board, captures=True, quiets=True):
+        return self._moves_along_rays(board, STRAIGHT_RAYS[self._row][self._col], captures, quiets)
 
     """
-    determine if moving a set distance is allowed.
-    if so, return a list containing just the move
-    else return an empty list
-    dr - distance moved in rows
-    dc - distance moved in cols
-    """
-    def _test_move(self, board, dr, dc):
-        new_row = self._row + dr
-        new_col = self._col + dc
-        end_square_colour = board.colour_at_square(new_row, new_col)
-        if end_square_colour == self._colour or end_square_colour == OFF_BOARD:
-            return []
-        elif end_square_colour == NO_PIECE:
-            return [Move(self, self._row, self._col, new_row, new_col, kill=None)]
-        else:
-            return [Move(self, self._row, self._col, new_row, new_col, kill=board.piece_at_square(new_row, new_col))]
+    gets the moves to each of the given target squares that is not
+    occupied by a piece of the same colour
+    """
+    def _jump_moves(self, board, targets, captures=True, quiets=True):
+        squares = board.get_squares()
+        possibles = []
+        for row, col in targets:
+            piece = squares[row][col]
+            if piece == None:
+                if quiets:
+                    possibles += [Move(self, self._row, self._col, row, col, kill=None)]
+            elif captures and piece.get_colour() != self._colour:
+                possibles += [Move(self, self._row, self._col, row, col, kill=piece)]
+        return possibles
    
     """
     determine all the possible moves for the knight
     """
-    def _knight_moves(self, board):
-        possibles = []
-        for dr, dc in [(2,1), (2,-1), (-2,1), (-2,-1), (1,2), (1,-2), (-1,2), (-1,-2)]:
-            possibles += self._test_move(board, dr, dc)
-        return possibles
+    def _knight_moves(self, board, captures=True, quiets=True):
+        return self._jump_moves(board, KNIGHT_TARGETS[self._row][self._col], captures, quiets)
 
     """
     determine all possible moves for the king
     """
-    def _king_moves(self, board):
-        possibles = []
-        for dr in [-1,0,1]:
-            for dc in [-1,0,1]:
-                if dr != 0 or dc != 0:
-                    possibles += self._test_move(board, dr, dc)
+    def _king_moves(self, board, captures=True, quiets=True):
+        possibles = self._jump_moves(board, KING_TARGETS[self._row][self._col], captures, quiets)
+        if not quiets:
+            return possibles
         #now check for castling, the following criteria must be met for a castle to occur
         #the king and the rook must not have moved
         #there must be no pieces inbetween the rook and the king 
@@ -168,75 +180,78 @@ class Piece(ABC):
             #determine which rook, the king starts on the right so positive is kingside castle
             rookID = ROOKQ_ID if direction == -1 else ROOKK_ID
             #now check all the criteria
-            if (not self.has_moved() and not board.get_piece(self._colour, rookID).has_moved() and
+            if (board.can_castle(self._colour, rookID) and
                     board.colour_at_square(self._row, self._col + direction) == NO_COLOUR and
                     board.colour_at_square(self._row, self._col + 2*direction) == NO_COLOUR and
-                    (direction == 1 or board.colour_at_square(self._row, self._col + 3*direction))):
+                    (direction == 1 or board.colour_at_square(self._row, self._col + 3*direction) == NO_COLOUR)):
                 #if all the criteria are met, add the castle as a move
                 possibles += [Move(self, self._row, self._col, self._row, self._col + 2*direction, castle=rookID)]
         return possibles
 
     """
-    returns all possible moves for this piece as a pawn
+    add a pawn move to the list of moves, as the four different promotions
+    if it reaches the last row
+    """
+    def _add_pawn_move(self, possibles, row, col, kill=None, en_passant=False):
+        if row in [0, NUM_ROWS - 1]:
+            for option in ["r", "n", "q", "b"]: #any promotion can be to 4 different pieces
+                possibles += [Move(self, self._row, self._col, row, col, kill=kill, promotion=option)]
+        else:
+            possibles += [Move(self, self._row, self._col, row, col, kill=kill, en_passant=en_passant)]
+
     """
-    def _pawn_moves(self, board):
+    returns all possible moves for this piece as a pawn. a step onto the
+    last row is a promotion, so counts with the captures
+    """
+    def _pawn_moves(self, board, captures=True, quiets=True):
         possibles = []
         #work our the direction of the pawn, white starts at the bottom
         direction = 1 if self._colour == WHITE else -1
         new_row = self._row + direction
+        promotes = new_row in [0, NUM_ROWS - 1]
         #can we move directly forward?
         if board.colour_at_square(new_row, self._col) == NO_COLOUR:
-            possibles += [Move(self, self._row, self._col, new_row, self._col, kill=None)]
+            if captures if promotes else quiets:
+                self._add_pawn_move(possibles, new_row, self._col)
             #can we double move forward?
-            if not self.has_moved() and board.colour_at_square(self._row + 2*direction, self._col) == NO_COLOUR:
-                possibles += [Move(self, self._row, self._col, self._row + 2*direction, self._col, kill=None)]
+            if quiets and not self.has_moved() and \
+                    board.colour_at_square(self._row + 2*direction, self._col) == NO_COLOUR:
+                self._add_pawn_move(possibles, self._row + 2*direction, self._col)
+        if not captures:
+            return possibles
         #next check for the ability to capture on the diagonal
         for side in [1,-1]:
             new_col = self._col + side
             if board.colour_at_square(new_row, new_col) == 1 - self._colour: #the other colour
-                possibles += [Move(self, self._row, self._col, new_row, new_col, kill=board.piece_at_square(new_row, new_col))]
+                self._add_pawn_move(possibles, new_row, new_col, kill=board.piece_at_square(new_row, new_col))
         #then check for the fabled en passant
-        if ((self._colour == WHITE and self._row == 4) or 
-                (self._colour == BLACK and self._row == 3)):
-            for side in [-1,1]:
-                attacked_col = self._col + side
-                previous_move = board.last_move() #this should not be null as we know our pawn has moved
-                #check for if a pawn has moved just ready for the en passant
-                if previous_move.piece.get_letter() == "p" and previous_move.end_row == self._row and \
-                        previous_move.end_col == attacked_col and \
-                        abs(previous_move.start_row - previous_move.end_row) == 2:
-                    possibles += [Move(self, self._row, self._col, 
-                            self._row + direction, attacked_col, kill=previous_move.piece)]
-        #ALSO NEED TO HANDLE PROMOTIONS HERE, NEED TO ADD MULTIPLE MOVES IN HERE
-        #next handle the possibility of promotion
-        if len(possibles) != 0 and possibles[0].end_row in [0,7]:
-            promotions = []
-            for move in possibles:
-                for option in ["r", "n", "q", "b"]: #any promotion can be to 4 different pieces
-                    new_move = move.duplicate()
-                    new_move.promotion = option
-                    promotions += [new_move]
-            return promotions
-        else: #there was no promotions, don't need to flesh it out, just accept it
-            return possibles
+        passant_col = board.en_passant_col()
+        if passant_col != NO_PASSANT and abs(passant_col - self._col) == 1 and \
+                self._row == (4 if self._colour == WHITE else 3):
+            #the pawn that just double stepped is next to us
+            self._add_pawn_move(possibles, new_row, passant_col,
+                    kill=board.piece_at_square(self._row, passant_col), en_passant=True)
+        return possibles
 
     """
     return all possible moves, does not fully check for legality of moves
+    captures - whether to include the captures and promotions
+    quiets - whether to include the other moves
     """
-    def possible_moves(self, board):
+    def possible_moves(self, board, captures=True, quiets=True):
         #no switch statments in python... :(
         if self._letter == "p": #pawn
-            return self._pawn_moves(board)
+            return self._pawn_moves(board, captures, quiets)
         elif self._letter == "r": #rook
-            return self._straight_moves(board)
+            return self._straight_moves(board, captures, quiets)
         elif self._letter == "b": #bishop
-            return self._diagonal_moves(board)
+            return self._diagonal_moves(board, captures, quiets)
         elif self._letter == "q": #queen
-            return self._straight_moves(board) + self._diagonal_moves(board)
+            return self._straight_moves(board, captures, quiets) + self._diagonal_moves(board, captures, quiets)
         elif self._letter == "n": #knight
-            return self._knight_moves(board)
+            return self._knight_moves(board, captures, quiets)
         elif self._letter == "k": #king
-            return self._king_moves(board)
+            return self._king_moves(board, captures, quiets)
         else:
             raise ValueError("piece not one of defined pieces")
 
@@ -245,10 +260,4 @@ class Piece(ABC):
     returns all LEGAL moves, checks for legality of all possible moves
     """
     def legal_moves(self, board):
-        possibles = self.possible_moves(board)
-        legals = []
-        for move in possibles:
-            if board.is_move_legal(move):
-                legals += [move]
-        return legals
-
+        return board.filter_legal_moves(self._colour, self.possible_moves(board))
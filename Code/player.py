@@ -1,6 +1,11 @@
 from abc import ABC, abstractmethod
+import asyncio
+import time
 from constants import *
-import subprocess
+from engine import Engine, ENGINE_TIMEOUT
+from detection import occupancy_mask, board_scan_mask, Scanner, LIFT, BOARD_FIRST_COL, BOARD_COLS
+from search import Search, MAX_DEPTH
+from transposition import TranspositionTable
 
 """
 abstract class for a player, handles picking moves etc
@@ -17,7 +22,30 @@ class Player(ABC):
     def make_move(self, board, legal_moves):
         pass
 
-    
+    """
+    make_move for use with asyncio, by Game.play_game_async. players which
+    wait on something outside the program override this so that other work
+    can carry on while they wait
+    """
+    async def make_move_async(self, board, legal_moves):
+        return self.make_move(board, legal_moves)
+
+"""
+abstract class for a player which can only pick moves under asyncio, so
+can only play with Game.play_game_async
+"""
+class AsyncPlayer(ABC):
+
+    def __init__(self, colour):
+        self._colour = colour
+
+    """
+    select a move from the possible moves dictionary and return the choice
+    """
+    @abstractmethod
+    async def make_move_async(self, board, legal_moves):
+        pass
+
 
 """
 concrete implementation of a player, who chooses moves from the command line
@@ -36,54 +64,313 @@ class ConsolePlayer(Player):
                 print(board.print_all_legal_moves(self._colour))
         return legal_moves[selection]
 
+"""
+the UCI command for the game on the board, as the start position and
+the moves played from it. sending the moves rather than the current
+position lets the engine know about repetitions. UCI has no way to send
+only the new moves, so the whole game is sent each time.
+extra - moves to send after the moves played on the board
+"""
+def position_command(board, extra=()):
+    if board.start_fen() == START_FEN:
+        command = "position startpos"
+    else:
+        command = "position fen %s" % board.start_fen()
+    moves = board.uci_moves() + list(extra)
+    if len(moves) > 0:
+        command += " moves " + " ".join(moves)
+    return command
+
 """
 concrete implementation of a player, which is controlled by a stockfish engine
+engine - an Engine to play with, such as one leased from an EnginePool, which
+         is set up by its owner. if not given the player starts its own
+         engine, set to the rating, which it shuts down in close
+ponder - True to keep the engine searching while the opponent thinks, on
+         the reply it expects
 """
 class StockfishPlayer(Player):
 
-    def __init__(self, colour, rating=20, thinktime=1000):
+    def __init__(self, colour, rating=20, thinktime=1000, engine=None, ponder=False):
         super().__init__(colour)
-        #start up the stockfish engine
-        self._engine = subprocess.Popen(
-                'stockfish',
-                universal_newlines = True,
-                stdin=subprocess.PIPE,
-                stdout=subprocess.PIPE,
-                bufsize=1,
-        )
         self._thinktime = thinktime
-        #then do the initial handshake
-        #first read the initial line sent by stockfish and discard it
-        self._engine.stdout.readline()
-        #then check if the process is ready
-        self._engine.stdin.write("isready\n")
-        response = self._engine.stdout.readline().strip()
-        if response != "readyok":
-            raise Exception("stockfish is not ready")
-        #ensure that stockfish is working in uci
-        self._engine.stdin.write("uci\n")
-        while response != "uciok":
-            response = self._engine.stdout.readline().strip()
-
-        #then set the difficulty
-        self._engine.stdin.write("setoption name Skill Level value %d\n" % rating)
-
+        self._owns_engine = engine == None
+        if self._owns_engine:
+            #start up the stockfish engine, then set the difficulty
+            engine = Engine()
+            engine.set_option("Skill Level", rating)
+        self._engine = engine
+        self._ponder = ponder
+        if ponder:
+            self._engine.set_option("Ponder", "true")
+        #the reply being pondered on, None if the engine is not pondering
+        self._expected = None
 
     """
     select a move by sending stockfish the current board and then
     letting it choose the best move
     """
     def make_move(self, board, legal_moves):
-        #first send the current game board to stockfish
-        self._engine.stdin.write("position fen %s\n" % board.fen())
-        #then ask the engine to make a decision, using the thinktime
-        self._engine.stdin.write("go movetime %d\n" % self._thinktime)
-
-        #then receive the response, there will be some extra stuff, wait for "bestmove" line
-        response = [""]
-        while response[0] != "bestmove":
-            response = self._engine.stdout.readline().strip().split()
-        #the chosen move comes after the bestmove text
+        last = board.last_move()
+        if self._expected != None and last != None and last.short_representation() == self._expected:
+            #the opponent played the move being pondered on, so the search
+            #becomes a normal one and keeps what it has found so far
+            self._engine.send("ponderhit")
+        else:
+            #any pondering was on the wrong position, so start again
+            self._engine.stop()
+            #first send the current game to stockfish
+            self._engine.send(position_command(board))
+            #then ask the engine to make a decision, using the thinktime
+            self._engine.go("movetime %d" % self._thinktime)
+        self._expected = None
+
+        #then receive the response, the chosen move comes after the bestmove text
+        response = self._engine.best_move()
         chosen = response[1]
         print("%s move: %s" % ("Black" if self._colour == BLACK else "White", chosen))
+        #think about the expected reply until the opponent moves
+        if self._ponder and len(response) >= 4 and response[2] == "ponder":
+            self._expected = response[3]
+            self._engine.send(position_command(board, [chosen, self._expected]))
+            self._engine.go("ponder movetime %d" % self._thinktime)
+        return legal_moves[chosen]
+
+    """
+    stop any pondering, and shut down the engine if the player started it
+    """
+    def close(self):
+        self._engine.stop()
+        self._expected = None
+        if self._owns_engine:
+            self._engine.close()
+
+"""
+concrete implementation of a player, which is controlled by a stockfish engine
+running under asyncio, for games played with Game.play_game_async
+engine - a started AsyncEngine
+rating - the skill level to set (0 to 20), or None to leave the engine's setting
+thinktime - the time for the engine to search, in milliseconds
+on_info - called with each info line of the engine's searches as a dictionary
+"""
+class AsyncStockfishPlayer(AsyncPlayer):
+
+    def __init__(self, colour, engine, rating=None, thinktime=1000, on_info=None):
+        super().__init__(colour)
+        self._engine = engine
+        self._thinktime = thinktime
+        self._on_info = on_info
+        if rating != None:
+            engine.set_option("Skill Level", rating)
+
+    """
+    select a move by sending stockfish the current game, waiting on its
+    search without blocking anything else
+    """
+    async def make_move_async(self, board, legal_moves):
+        self._engine.send(position_command(board))
+        #the search is given some leeway past its time before the engine is taken to be hung
+        chosen, ponder = await self._engine.go("movetime %d" % self._thinktime,
+                timeout=self._thinktime / 1000 + ENGINE_TIMEOUT, on_info=self._on_info)
+        print("%s move: %s" % ("Black" if self._colour == BLACK else "White", chosen))
+        return legal_moves[chosen]
+
+"""
+concrete implementation of a player, which chooses moves with the built in
+search rather than an external engine
+rating - the skill from 0 to 20 (like the stockfish skill level), lower
+         ratings search less deeply and choose among more of the good moves
+thinktime - the most time to spend on a move in milliseconds
+"""
+class SearchPlayer(Player):
+
+    def __init__(self, colour, rating=20, thinktime=1000):
+        super().__init__(colour)
+        self._thinktime = thinktime
+        #each rating point is worth a sixth of a ply and ten centipawns
+        self._max_depth = MAX_DEPTH if rating >= 20 else 1 + rating // 6
+        self._margin = (20 - rating) * 10
+
+    """
+    select a move by searching the current board
+    """
+    def make_move(self, board, legal_moves):
+        move, score, depth = Search(board, self._thinktime, self._max_depth, self._margin).search()
+        chosen = move.short_representation()
+        print("%s move: %s" % ("Black" if self._colour == BLACK else "White", chosen))
+        return legal_moves[chosen]
+
+"""
+concrete implementation of a player, which searches every move to a fixed
+depth, remembering the positions it has searched in a transposition table
+depth - the number of half moves to look ahead
+megabytes - the memory for the transposition table
+"""
+class MinimaxPlayer(Player):
+
+    def __init__(self, colour, depth=4, megabytes=16):
+        super().__init__(colour)
+        self._depth = depth
+        #the table is kept between moves, as the next search covers many of the same positions
+        self._table = TranspositionTable(megabytes)
+
+    """
+    select a move by searching the current board to the fixed depth
+    """
+    def make_move(self, board, legal_moves):
+        move, score, depth = Search(board, None, self._depth, table=self._table).search()
+        chosen = move.short_representation()
+        print("%s move: %s" % ("Black" if self._colour == BLACK else "White", chosen))
+        return legal_moves[chosen]
+
+    """
+    the transposition table, to see how well it is being used
+    """
+    def table(self):
+        return self._table
+
+"""
+the squares a move changes on the board as a bitmask (bit row * 8 + col),
+and the occupancy of the board after it
+occupied - the occupancy before the move
+"""
+def move_footprint(board, move, occupied):
+    start = 1 << (move.start_row * NUM_COLS + move.start_col)
+    end = 1 << (move.end_row * NUM_COLS + move.end_col)
+    #a piece being taken is lifted off the end square before the move is made
+    touched = start | end
+    after = (occupied & ~start) | end
+    if move.en_passant:
+        victim = 1 << (move.kill.get_row() * NUM_COLS + move.kill.get_col())
+        touched |= victim
+        after &= ~victim
+    if move.castle != NO_CASTLE:
+        rook = board.get_piece(move.piece.get_colour(), move.castle)
+        rook_start = 1 << (rook.get_row() * NUM_COLS + rook.get_col())
+        rook_end = 1 << (rook.get_row() * NUM_COLS + (5 if move.castle == ROOKK_ID else 3))
+        touched |= rook_start | rook_end
+        after = (after & ~rook_start) | rook_end
+    return touched, after
+
+"""
+concrete implementation of a player, who moves the pieces on the physical
+board. the move is found from which squares have changed: every legal move
+is indexed by the occupancy it leaves and the squares it touches, so the
+sensor readings are matched with one dictionary lookup.
+the squares are read through a Scanner, so only changes which have held for
+a few scans are seen, and only pieces lifted off the squares they started
+on count as touched, so a piece sliding over empty squares on its way
+leaves nothing behind. a reading must then hold for settle seconds before
+it is taken as a move, so that it is not matched halfway through a move.
+castling should be done by moving the king first, as moving the rook first
+passes through a rook move
+detection - the Detection of the board
+promotion - the piece pawns are promoted to, which the sensors cannot see
+debounce - the scans in a row a square must read the same to change
+interval - the seconds between scans
+"""
+class BoardSensorPlayer(Player):
+
+    def __init__(self, colour, detection, promotion="q", settle=0.5, interval=0.01, debounce=3):
+        super().__init__(colour)
+        self._detection = detection
+        self._promotion = promotion
+        self._settle = settle
+        self._interval = interval
+        self._debounce = debounce
+
+    """
+    index the legal moves by the sensor readings they would give, as
+    (occupancy after, squares touched) pairs. promotions to different
+    pieces read the same, so each pair has a list of moves
+    """
+    def _index_moves(self, board, legal_moves):
+        occupied = board.occupancy()
+        index = {}
+        for move in legal_moves.values():
+            touched, after = move_footprint(board, move, occupied)
+            index.setdefault((after, touched), []).append(move)
+        return index
+
+    """
+    set up the matching of sensor readings for a new move, which is then
+    waited for by calling read_move after each scan interval
+    """
+    def start_move(self, board, legal_moves):
+        self._index = self._index_moves(board, legal_moves)
+        #only the squares a legal move touches can show the move, so only they
+        #are scanned, after a full scan (by the scanner) to bring the whole grid up to date
+        touched = 0
+        for after, move_touched in self._index:
+            touched |= move_touched
+        self._scanner = Scanner(self._detection, self._debounce, board_scan_mask(touched))
+        self._start = board.occupancy()
+        self._occupied = occupancy_mask(self._scanner.stable_board())
+        #the squares which started with a piece and have had it lifted off
+        self._lifted = 0
+        self._reading = None
+        self._since = None
+
+    """
+    take one sensor reading, returning the move it shows once it has
+    settled, or None
+    """
+    def read_move(self):
+        for event in self._scanner.scan():
+            col = event.col - BOARD_FIRST_COL
+            if col < 0 or col >= BOARD_COLS:
+                continue
+            bit = 1 << (event.row * BOARD_COLS + col)
+            if event.kind == LIFT:
+                self._occupied &= ~bit
+                #a piece passing over an empty square is put down and lifted
+                #again, so only lifts from the starting squares are kept
+                if self._start & bit:
+                    self._lifted |= bit
+            else:
+                self._occupied |= bit
+        changed = self._occupied ^ self._start
+        #everything back where it started means the piece was put back, so
+        #the move starts again
+        if changed == 0:
+            self._lifted = 0
+        reading = (self._occupied, self._lifted | changed)
+        now = time.monotonic()
+        if reading != self._reading:
+            self._reading = reading
+            self._since = now
+        elif reading in self._index and now - self._since >= self._settle:
+            moves = self._index[reading]
+            for move in moves:
+                if move.promotion == None or move.promotion == self._promotion:
+                    return move
+            return moves[0]
+        return None
+
+    def _chosen(self, move, legal_moves):
+        chosen = move.short_representation()
+        print("%s move: %s" % ("Black" if self._colour == BLACK else "White", chosen))
         return legal_moves[chosen]
+
+    """
+    wait for the player to make a move on the physical board
+    """
+    def make_move(self, board, legal_moves):
+        self.start_move(board, legal_moves)
+        while True:
+            move = self.read_move()
+            if move != None:
+                return self._chosen(move, legal_moves)
+            time.sleep(self._interval)
+
+    """
+    wait for the player to make a move on the physical board, letting other
+    tasks run between the scans
+    """
+    async def make_move_async(self, board, legal_moves):
+        self.start_move(board, legal_moves)
+        while True:
+            move = self.read_move()
+            if move != None:
+                return self._chosen(move, legal_moves)
+            await asyncio.sleep(self._interval)
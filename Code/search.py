@@ -0,0 +1,276 @@
+import random
+import time
+from constants import *
+from transposition import EXACT, LOWER_BOUND, UPPER_BOUND, NO_MOVE
+
+"""
+a built in engine for choosing moves, an alpha-beta search over the board
+using the board's own evaluation.
+each iteration searches one ply deeper than the last, until the time runs
+out or the deepest allowed search is done, and the result of the deepest
+finished iteration is used.
+"""
+
+#the score for being mated at the root, mates further away score less
+MATE_SCORE = 100000
+INFINITY = MATE_SCORE + 1
+
+#the deepest iteration, even with time to spare
+MAX_DEPTH = 64
+
+#the number of nodes searched between looks at the clock
+CLOCK_CHECK_NODES = 1024
+
+#scores beyond this are mates
+MATE_BOUND = MATE_SCORE - 1000
+
+"""
+raised within a search when its time runs out, the unfinished iteration
+is thrown away
+"""
+class SearchTimeout(Exception):
+    pass
+
+"""
+mate scores count the moves from the root, but an entry in a transposition
+table can be reached at any ply, so the table holds them counted from the
+position itself
+"""
+def _score_to_table(score, ply):
+    if score >= MATE_BOUND:
+        return score + ply
+    if score <= -MATE_BOUND:
+        return score - ply
+    return score
+
+def _score_from_table(score, ply):
+    if score >= MATE_BOUND:
+        return score - ply
+    if score <= -MATE_BOUND:
+        return score + ply
+    return score
+
+"""
+scores quiet moves by how often they have caused cutoffs, for ordering moves
+in positions where there is no better guide. deeper cutoffs count for more
+"""
+class HistoryTable:
+
+    def __init__(self):
+        self.clear()
+
+    def clear(self):
+        #indexed by colour then start square * 64 + end square
+        self._scores = [[0] * (NUM_ROWS * NUM_COLS) ** 2 for colour in range(NUM_COLOURS)]
+
+    def _index(self, move):
+        return (move.start_row * NUM_COLS + move.start_col) * NUM_ROWS * NUM_COLS + \
+                move.end_row * NUM_COLS + move.end_col
+
+    """
+    record a cutoff by a quiet move searched to the given depth
+    """
+    def add(self, move, depth):
+        self._scores[move.piece.get_colour()][self._index(move)] += depth * depth
+
+    def score(self, move):
+        return self._scores[move.piece.get_colour()][self._index(move)]
+
+class Search:
+
+    """
+    constructor
+    board - the board to search, it is left as it was found
+    thinktime - the time budget in milliseconds, None to always finish
+                the deepest iteration
+    max_depth - the deepest iteration to search to
+    margin - the root moves scoring within this many centipawns of the best
+             are all candidates for the chosen move, 0 only keeps the best
+    table - a TranspositionTable to share results between positions, which
+            can be kept from one search to the next, or None to not use one
+    """
+    def __init__(self, board, thinktime=1000, max_depth=MAX_DEPTH, margin=0, table=None):
+        self._board = board
+        self._thinktime = thinktime
+        self._max_depth = max_depth
+        self._margin = margin
+        self._table = table
+        self._history = HistoryTable()
+        self._deadline = None
+        #the first iteration always finishes, so there is a move to choose
+        self._can_stop = False
+        self._nodes = 0
+        #the number of moves the search has played on the board and not undone
+        self._played = 0
+
+    """
+    search the position for the side to move.
+    returns the chosen move, its score and the depth of the deepest finished
+    iteration, or None for the move if there are no legal moves
+    """
+    def search(self):
+        colour = self._board.turn()
+        moves = list(self._board.ordered_moves(colour))
+        if len(moves) == 0:
+            return None, 0, 0
+        if self._thinktime != None:
+            self._deadline = time.perf_counter() + self._thinktime / 1000
+        self._nodes = 0
+        scores = [(0, move) for move in moves]
+        depth = 0
+        while depth < self._max_depth:
+            self._can_stop = depth > 0 and self._deadline != None
+            try:
+                scores = self._search_root(colour, [move for score, move in scores], depth + 1)
+            except SearchTimeout:
+                #put the board back to the root and keep the last finished iteration
+                while self._played > 0:
+                    self._take_back()
+                break
+            depth += 1
+            #a forced mate will not be improved on by searching deeper
+            if abs(scores[0][0]) >= MATE_SCORE - MAX_DEPTH:
+                break
+        best = scores[0][0]
+        candidates = [move for score, move in scores if score >= best - self._margin]
+        return random.choice(candidates), best, depth
+
+    """
+    the score of the position for the side to move, searched to the given
+    depth without a time limit. ply is the number of moves the position is
+    from the root of a wider search, to count mates from there
+    """
+    def score(self, depth, ply=0):
+        colour = self._board.turn()
+        self._can_stop = False
+        self._nodes = 0
+        #the shallower searches fill the table and history to order the deeper ones
+        for iteration in range(min(depth, 1), depth + 1):
+            score = self._negamax(colour, iteration, -INFINITY, INFINITY, ply)
+        return score
+
+    """
+    the number of positions visited by the last search
+    """
+    def nodes(self):
+        return self._nodes
+
+    """
+    search every root move to the given depth, returning (score, move) pairs
+    with the best first. moves scoring within the margin of the best are
+    searched exactly, the rest only as far as showing they are worse
+    """
+    def _search_root(self, colour, moves, depth):
+        scores = []
+        best = -INFINITY
+        for move in moves:
+            #a move failing low only scores an upper bound of alpha, so alpha is
+            #kept just below the margin for every move within it to score exactly
+            alpha = max(best - self._margin - 1, -INFINITY)
+            self._play(move)
+            score = -self._negamax(1 - colour, depth - 1, -INFINITY, -alpha, 1)
+            self._take_back()
+            scores += [(score, move)]
+            best = max(best, score)
+        #the sort is stable, so equal moves keep the order they were searched in
+        scores.sort(key=lambda pair: -pair[0])
+        return scores
+
+    """
+    the score of the position for the given colour, to move, searched to the
+    given depth. scores at or below alpha or at or above beta are only bounds
+    """
+    def _negamax(self, colour, depth, alpha, beta, ply):
+        self._visit()
+        board = self._board
+        #repeating a position can be forced again, so treat it as the draw it leads to
+        if board.repetition_count() >= 2 or board.half_moves_since_event() >= 100:
+            return 0
+        if depth <= 0:
+            return self._quiesce(colour, alpha, beta)
+        #a deep enough result from the table may settle the position without a search
+        table_move = None
+        if self._table != None:
+            key = board.position_hash()
+            entry = self._table.probe(key)
+            if entry != None:
+                entry_depth, bound, score, table_move = entry
+                if table_move == NO_MOVE:
+                    table_move = None
+                score = _score_from_table(score, ply)
+                if entry_depth >= depth and (bound == EXACT or
+                        (bound == LOWER_BOUND and score >= beta) or
+                        (bound == UPPER_BOUND and score <= alpha)):
+                    return score
+        original_alpha = alpha
+        best = -INFINITY
+        best_move = None
+        for move in board.ordered_moves(colour, table_move, history=self._history):
+            self._play(move)
+            score = -self._negamax(1 - colour, depth - 1, -beta, -alpha, ply + 1)
+            self._take_back()
+            if score > best:
+                best = score
+                best_move = move
+                if score > alpha:
+                    alpha = score
+                    if alpha >= beta:
+                        if move.kill == None and move.promotion == None:
+                            self._history.add(move, depth)
+                        break
+        #no moves at all is checkmate or stalemate
+        if best_move == None:
+            return -MATE_SCORE + ply if board.is_check(1 - colour) else 0
+        if self._table != None:
+            if best <= original_alpha:
+                bound = UPPER_BOUND
+            elif best >= beta:
+                bound = LOWER_BOUND
+            else:
+                bound = EXACT
+            self._table.store(key, depth, bound, _score_to_table(best, ply), best_move.encode())
+        return best
+
+    """
+    search only captures and promotions until the position is quiet, so that
+    the score is not taken in the middle of an exchange. captures that lose
+    material by static exchange evaluation are skipped. the side to move
+    can always choose to stop taking, so the static score is a lower bound
+    """
+    def _quiesce(self, colour, alpha, beta):
+        best = self._board.evaluate(colour)
+        if best >= beta:
+            return best
+        alpha = max(alpha, best)
+        for move in self._board.ordered_moves(colour, quiet=False):
+            #captures that lose material in the exchange are not worth following
+            if move.promotion == None and self._board.see(move) < 0:
+                continue
+            self._visit()
+            self._play(move)
+            score = -self._quiesce(1 - colour, -beta, -alpha)
+            self._take_back()
+            if score > best:
+                best = score
+                if score > alpha:
+                    alpha = score
+                    if alpha >= beta:
+                        break
+        return best
+
+    """
+    count a node, and stop the search if the time is up
+    """
+    def _visit(self):
+        self._nodes += 1
+        if self._can_stop and self._nodes % CLOCK_CHECK_NODES == 0 and \
+                time.perf_counter() >= self._deadline:
+            raise SearchTimeout()
+
+    def _play(self, move):
+        self._board.execute_move(move)
+        self._played += 1
+
+    def _take_back(self):
+        self._board.undo_move()
+        self._played -= 1
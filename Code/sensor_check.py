@@ -0,0 +1,78 @@
+import sys
+import time
+from bitboard import BitBoard
+from constants import *
+from detection import Detection, FakeBackend, BOARD_FIRST_COL
+from move import SQUARE_NAMES
+from player import BoardSensorPlayer
+
+"""
+checks that BoardSensorPlayer reads moves made by hand on the board, using
+the stand in for the hardware. each move is played out as the sensors would
+see it, including pieces passing over squares on the way and contacts
+bouncing, and must be read as the move made and nothing else.
+
+run from the Code directory:
+    python -m sensor_check
+"""
+
+#the seconds between scans and for a reading to settle, so that a piece
+#passing over a square for five scans is shorter than the settle time
+INTERVAL = 0.01
+SETTLE = 0.1
+
+#the most scans to wait for the last step to be read as a move
+MAX_SCANS = 100
+
+#the squares by name, as (row, col)
+SQUARES = {SQUARE_NAMES[row][col]: (row, col) for row in range(NUM_ROWS) for col in range(NUM_COLS)}
+
+#positions, the steps of the move as (square, occupied, scans held for), and
+#the move that must be read. the last step is held until the move is read
+SUITE = [
+    ("rook slides over a square", "4k3/8/8/8/8/8/8/R3K3 w - - 0 1",
+            [("a1", False, 2), ("a3", True, 5), ("a3", False, 2), ("a4", True, 0)], "a1a4"),
+    ("contact bounce on the start", "4k3/8/8/8/8/8/4P3/4K3 w - - 0 1",
+            [("e2", False, 1), ("e2", True, 2), ("e2", False, 3), ("e4", True, 0)], "e2e4"),
+    ("capture", "4k3/8/8/3p4/4P3/8/8/4K3 w - - 0 1",
+            [("d5", False, 4), ("e4", False, 4), ("d5", True, 0)], "e4d5"),
+    ("piece put back", "4k3/8/8/8/8/8/8/R3K3 w - - 0 1",
+            [("a1", False, 4), ("a1", True, 4), ("e1", False, 4), ("e2", True, 0)], "e1e2"),
+    ("castling", "4k3/8/8/8/8/8/8/4K2R w K - 0 1",
+            [("e1", False, 3), ("g1", True, 3), ("h1", False, 3), ("f1", True, 0)], "e1g1"),
+]
+
+"""
+play out the steps on the stand in board, returning the move read as a
+UCI string, None if no move was read
+"""
+def read_steps(board, steps):
+    backend = FakeBackend()
+    occupied = board.occupancy()
+    for row in range(NUM_ROWS):
+        for col in range(NUM_COLS):
+            backend.set_occupied(row, BOARD_FIRST_COL + col, (occupied >> (row * NUM_COLS + col)) & 1 == 1)
+    player = BoardSensorPlayer(board.turn(), Detection(backend), settle=SETTLE, interval=INTERVAL)
+    player.start_move(board, board.all_legal_moves_dict(board.turn()))
+    for i, (square, piece, scans) in enumerate(steps):
+        row, col = SQUARES[square]
+        backend.set_occupied(row, BOARD_FIRST_COL + col, piece)
+        last = i == len(steps) - 1
+        for scan in range(MAX_SCANS if last else scans):
+            move = player.read_move()
+            if move != None:
+                return move.short_representation() if last else "early " + move.short_representation()
+            time.sleep(INTERVAL)
+    return None
+
+def main():
+    passed = True
+    for name, fen, steps, expected in SUITE:
+        read = read_steps(BitBoard.from_fen(fen), steps)
+        correct = read == expected
+        passed = passed and correct
+        print("%-30s %-8s %s" % (name, read, "ok" if correct else "FAILED (expected %s)" % expected))
+    return 0 if passed else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
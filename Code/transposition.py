@@ -0,0 +1,131 @@
+from array import array
+
+"""
+a transposition table, remembering the results of searching positions so
+that a position reached again by a different order of moves is not searched
+from scratch. entries are looked up by the position's Zobrist hash.
+
+the table is a fixed number of buckets held in two flat arrays, one of
+hashes and one of packed entries, so its size never changes during a game.
+each bucket has two slots: the first keeps the entry searched deepest, and
+the second takes every entry that is not deep enough for the first.
+"""
+
+#how the stored score relates to the true score of the position
+EXACT = 1
+LOWER_BOUND = 2
+UPPER_BOUND = 3
+
+#the bytes taken by one slot, an 8 byte hash and an 8 byte entry
+SLOT_BYTES = 16
+SLOTS_PER_BUCKET = 2
+
+#layout of a packed entry, from the lowest bits: the encoded best move,
+#the depth, the bound and the score (offset to be positive)
+MOVE_BITS = 17
+DEPTH_BITS = 7
+BOUND_BITS = 2
+DEPTH_SHIFT = MOVE_BITS
+BOUND_SHIFT = DEPTH_SHIFT + DEPTH_BITS
+SCORE_SHIFT = BOUND_SHIFT + BOUND_BITS
+SCORE_OFFSET = 1 << 20
+
+#the best move stored when there is none
+NO_MOVE = 0
+
+class TranspositionTable:
+
+    """
+    constructor
+    megabytes - the memory budget for the table
+    """
+    def __init__(self, megabytes=16):
+        self._buckets = max(1, int(megabytes * 1024 * 1024) // (SLOT_BYTES * SLOTS_PER_BUCKET))
+        self.clear()
+
+    """
+    forget every entry, for a new game
+    """
+    def clear(self):
+        #an entry of 0 marks an empty slot, as every stored entry has a bound
+        self._hashes = array("Q", bytes(8 * SLOTS_PER_BUCKET * self._buckets))
+        self._entries = array("Q", bytes(8 * SLOTS_PER_BUCKET * self._buckets))
+        self.reset_stats()
+
+    """
+    look up a position by its hash.
+    returns (depth, bound, score, move) with the move as encoded by
+    Move.encode, or None if the position is not in the table
+    """
+    def probe(self, key):
+        self.probes += 1
+        slot = (key % self._buckets) * SLOTS_PER_BUCKET
+        for i in range(slot, slot + SLOTS_PER_BUCKET):
+            entry = self._entries[i]
+            if entry != 0 and self._hashes[i] == key:
+                self.hits += 1
+                return ((entry >> DEPTH_SHIFT) & ((1 << DEPTH_BITS) - 1),
+                        (entry >> BOUND_SHIFT) & ((1 << BOUND_BITS) - 1),
+                        (entry >> SCORE_SHIFT) - SCORE_OFFSET,
+                        entry & ((1 << MOVE_BITS) - 1))
+        return None
+
+    """
+    store the result of searching a position.
+    the entry goes in the first slot of its bucket if it was searched at least
+    as deep as what is there (or is the same position), else in the second
+    """
+    def store(self, key, depth, bound, score, move=NO_MOVE):
+        self.stores += 1
+        entry = move | (min(depth, (1 << DEPTH_BITS) - 1) << DEPTH_SHIFT) | \
+                (bound << BOUND_SHIFT) | ((score + SCORE_OFFSET) << SCORE_SHIFT)
+        slot = (key % self._buckets) * SLOTS_PER_BUCKET
+        old = self._entries[slot]
+        if old == 0 or self._hashes[slot] == key or \
+                depth >= (old >> DEPTH_SHIFT) & ((1 << DEPTH_BITS) - 1):
+            #the deeper entry moves down to the second slot rather than being lost
+            if old != 0 and self._hashes[slot] != key:
+                self._replace(slot + 1, self._hashes[slot], old)
+            self._replace(slot, key, entry)
+        else:
+            self._replace(slot + 1, key, entry)
+
+    def _replace(self, slot, key, entry):
+        if self._entries[slot] != 0 and self._hashes[slot] != key:
+            self.overwrites += 1
+        self._hashes[slot] = key
+        self._entries[slot] = entry
+
+    """
+    the number of slots in the table
+    """
+    def size(self):
+        return len(self._entries)
+
+    """
+    the fraction of the slots holding an entry, looked at over the first
+    thousand slots as the hashes spread evenly over the table
+    """
+    def fill(self):
+        sample = min(1000, len(self._entries))
+        return sum(1 for i in range(sample) if self._entries[i] != 0) / sample
+
+    """
+    the fraction of lookups which found their position
+    """
+    def hit_rate(self):
+        return self.hits / self.probes if self.probes > 0 else 0
+
+    def reset_stats(self):
+        self.probes = 0
+        self.hits = 0
+        self.stores = 0
+        self.overwrites = 0
+
+    """
+    the usage of the table as a string, for sizing it
+    """
+    def stats_string(self):
+        return "%d slots (%.0f%% full), %d probes, %.1f%% hits, %d stores, %d overwrites" % (
+                self.size(), 100 * self.fill(), self.probes, 100 * self.hit_rate(),
+                self.stores, self.overwrites)
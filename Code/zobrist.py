@@ -0,0 +1,26 @@
+import random
+from constants import *
+
+"""
+random keys for Zobrist hashing. a position is hashed by xoring together the
+key of every piece on its square, with keys for the side to move, castling
+rights and en passant column. a move then only changes the keys of what it
+touches, so the hash can be kept up to date as moves are made.
+the keys come from a fixed seed so a position hashes the same in every run
+and every process
+"""
+
+_random = random.Random(20210430)
+
+def _key():
+    return _random.getrandbits(64)
+
+#one key for every piece letter of each colour on every square (row * 8 + col)
+PIECE_KEYS = [{letter: [_key() for square in range(NUM_ROWS * NUM_COLS)] for letter in "pnbrqk"}
+        for colour in range(NUM_COLOURS)]
+#included when it is black to move
+BLACK_TO_MOVE_KEY = _key()
+#one key for each castling right, by colour and rook index
+CASTLING_KEYS = [{ROOKK_ID: _key(), ROOKQ_ID: _key()} for colour in range(NUM_COLOURS)]
+#one key for each column en passant can capture on
+EN_PASSANT_KEYS = [_key() for col in range(NUM_COLS)]